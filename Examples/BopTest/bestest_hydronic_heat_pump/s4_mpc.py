@@ -22,6 +22,7 @@ def run(config: dict, predictors: list) -> [dict, dict]:
             constraints=[
                 Constraint(feature=u_hp, lb=0, ub=1),
             ],
+            parametric_predictors=True,  # online learning only swaps the predictor weights, no rebuild required
         ),
         forecast_callback=system.get_forecast,
         solution_plotter=mpc_plotter,
@@ -57,13 +58,14 @@ def run(config: dict, predictors: list) -> [dict, dict]:
 
         df = None
 
+        # build nonlinear problem with trained models
+        # default algorithm: ipopt
+        hhp_MPC.nlp.build(
+            solver_options=solver_options, predictors=predictors
+        )
+
         #  Online learning loop
         for repetition in range(14):  # 14 days: standard period in BOPTEST to ensure comparability
-            # build nonlinear problem with trained models
-            # default algorithm: ipopt
-            hhp_MPC.nlp.build(
-                solver_options=solver_options, predictors=predictors
-            )
 
             # runs the system for the given duration using the given MPC controller
             # duration has to be dividable by step size of the system
@@ -85,12 +87,16 @@ def run(config: dict, predictors: list) -> [dict, dict]:
                     if isinstance(predictors[n], NeuralNetwork):
                         predictors[n].update_casadi_model()
 
+            # pass the retrained predictors to the nlp (only rebuilds if the parameter layout changed)
+            hhp_MPC.nlp.update_predictors(predictors)
+
             # concat data frame of current repetition to data frame of previous iterations if existing
             if df is None:
                 df = online_data.df
             else:
                 df = pd.concat([df, online_data.df], axis=0)
         system.close()
+        hhp_MPC.close()  # write the buffered solutions to solutions.h5
 
         # save data frame with data from all repetitions to file data.csv (directory: /stored_data/[mpc_name]/ )
         df.to_csv(str(Path(FileManager.experiment_dir(), 'data.csv')))
@@ -111,14 +117,12 @@ def run(config: dict, predictors: list) -> [dict, dict]:
                 success += 1
     kpis['successful_runs'] = success / count
 
-    # calculate mean runtime of solver
-    total_runtime = 0
-    count = 0
-    for element in df['runtime']:
-        if not np.isnan(element):  # don't take into account NaN elements at the beginning
-            count += 1
-            total_runtime += element
-    kpis['runtime_mean'] = total_runtime / count
+    # summarize the timings of the controller (NaN elements at the beginning are not taken into account)
+    summary = solver_summary(df)
+    summary.to_csv(str(Path(FileManager.experiment_dir(), 'solver_summary.csv')))
+    kpis['runtime_mean'] = summary.loc['runtime', 'mean']
+    kpis['runtime_p90'] = summary.loc['runtime', 'p90']
+    kpis['runtime_p99'] = summary.loc['runtime', 'p99']
 
     kpis_df = pd.DataFrame(data=kpis, index=[0])
     kpis_df.to_csv(str(Path(FileManager.experiment_dir(), 'kpis.csv')), index=False)
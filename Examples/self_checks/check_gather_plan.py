@@ -0,0 +1,107 @@
+from Examples.self_checks.config import *
+
+"""
+Self check of the index maps that NLP.build() calculates for the controller:
+the gather plan of the parameter values is compared to a lookup of every par var one by one and
+the shift of the warm start is compared to a search for the same variable or constraint one control step later.
+"""
+
+predictors = [TAirRoom_predictor(), P_heat_predictor()]
+
+variants = {
+    'uniform':              dict(),
+    'control_change_step':  dict(control_change_step=2),
+    'stage ordering':       dict(ordering='stage'),
+    'grid':                 dict(grid=[(4, 1), (2, 2)]),
+}
+
+
+def interval_lengths(nlp_: NLP, grid: Optional[list[tuple[int, int]]]) -> dict[int, int]:
+    """ length of the interval that starts at k, for every k within the horizon """
+
+    if grid is None:
+        return {k: 1 for k in range(nlp_.N)}
+
+    lengths = dict()
+    k = 0
+    for count, length in grid:
+        for _ in range(count):
+            lengths[k] = length
+            k += length
+
+    return lengths
+
+
+def reference_par_vals(nlp_: NLP, past: pd.DataFrame, forecast: pd.DataFrame, lengths: dict[int, int]) -> list:
+    """ looks up every par var in the past (k <= 0) or the forecast (k > 0), averaged over its interval """
+
+    par_vals = list()
+    for par_var in nlp_._par_vars:
+
+        if par_var.k <= 0:
+            value = past.loc[past['time'] == time_offset + step_size * par_var.k, par_var.col_name]
+            assert len(value) == 1
+            par_vals.append(float(value.iloc[0]))
+            continue
+
+        length = lengths.get(par_var.k, 1) if par_var.k < nlp_.N else 1
+        times = time_offset + step_size * (par_var.k + np.arange(length))
+        values = forecast.loc[forecast['time'].isin(times), par_var.col_name]
+        assert len(values) == length
+        par_vals.append(float(values.mean()))
+
+    return par_vals
+
+
+def check_shift(name: str, shift: np.ndarray, elements: list[tuple], control_change_step: int):
+    """
+    every element has to be shifted to the element of the same group with the smallest k that is at least
+    one control step later, or to the last element of its group.
+    Elements with the same group and k are matched by their order.
+    """
+
+    assert len(shift) == len(elements), name
+
+    for i, (group, k) in enumerate(elements):
+
+        order = sum(1 for g, j in elements[:i] if (g, j) == (group, k))
+        ks = sorted({j for g, j in elements if g == group})
+        later = [j for j in ks if j >= k + control_change_step]
+        target = min(later) if later else max(ks)
+
+        candidates = [j for j, (g, kj) in enumerate(elements) if (g, kj) == (group, target)]
+        expected = candidates[min(order, len(candidates) - 1)]
+
+        assert shift[i] == expected, f'{name}: element {i} {group} at k={k} is shifted to {shift[i]}, not {expected}'
+
+
+def check(name: str, **kwargs):
+
+    nlp_ = nlp(N=8, **kwargs)
+    nlp_.build(predictors)
+
+    past, forecast = frames(nlp_.N)
+
+    # parameter values
+    par_vals = mpc(nlp_, forecast)._get_par_vals(past, forecast, time_offset)
+    expected = reference_par_vals(nlp_, past, forecast, interval_lengths(nlp_, kwargs.get('grid')))
+
+    assert len(par_vals) == len(expected), name
+    for par_var, val, exp in zip(nlp_._par_vars, par_vals, expected):
+        assert np.isclose(val, exp, rtol=0, atol=1e-12), f'{name}: {par_var} is {val}, not {exp}'
+
+    # shift of the warm start
+    check_shift(f'{name} (opt vars)', nlp_._shift_x,
+                [((var.__class__.__name__, var.feature.source.name), var.k) for var in nlp_._opt_vars],
+                nlp_.control_change_step)
+    check_shift(f'{name} (constraints)', nlp_._shift_g,
+                [(constraint.origin, constraint.k) for constraint in nlp_._constraints],
+                nlp_.control_change_step)
+
+    print(f'{name:<20} OK ({len(nlp_._gather_plan)} column groups, {len(nlp_._par_vars)} par vars)')
+
+
+if __name__ == '__main__':
+
+    for name, kwargs in variants.items():
+        check(name, **kwargs)
@@ -0,0 +1,96 @@
+from Examples.self_checks.config import *
+
+"""
+Self check of the SolutionLayout of NLP.build() and the NLPSolution that uses it.
+Every value, the DataFrame and the controls are compared to a lookup of the nlp variables one by one.
+Random values are used instead of a solve, so every position of the solution holds a distinct value.
+"""
+
+predictors = [TAirRoom_predictor(), P_heat_predictor()]
+
+variants = {
+    'uniform':              dict(),
+    'control_change_step':  dict(control_change_step=2),
+    'stage ordering':       dict(ordering='stage'),
+    'grid':                 dict(grid=[(4, 1), (2, 2)]),
+}
+
+
+def reference_values(nlp_: NLP, par_vals: np.ndarray, opt_vals: np.ndarray) -> dict[str, dict[int, float]]:
+    """ {col_name: {k: value}} of all nlp variables except the slacks, later variables overwrite earlier ones """
+
+    values = dict()
+    for var, val in zip(nlp_._par_vars + nlp_._opt_vars, np.concatenate([par_vals, opt_vals])):
+
+        if isinstance(var, NLPEpsilon):
+            continue
+
+        values.setdefault(var.col_name, dict())[var.k] = float(val)
+
+    return values
+
+
+def reference_controls(nlp_: NLP, opt_vals: np.ndarray, k: int, hold: bool) -> dict[str, float]:
+    """ controls of the last control variable at or before k, or exactly at k if hold is False """
+
+    controls = dict()
+    latest = dict()
+    for var, val in zip(nlp_._opt_vars, opt_vals):
+
+        if not isinstance(var, NLPValue) or not isinstance(var.feature, Control):
+            continue
+
+        if var.k > k or (not hold and var.k != k) or var.k < latest.get(var.col_name, -np.inf):
+            continue
+
+        latest[var.col_name] = var.k
+
+        if var.feature.cutoff is not None and val <= var.feature.cutoff:
+            val = var.feature.default
+
+        controls[var.col_name] = float(val)
+
+    return controls
+
+
+def check(name: str, **kwargs):
+
+    nlp_ = nlp(N=8, **kwargs)
+    nlp_.build(predictors)
+
+    par_vals = rng.uniform(size=len(nlp_._par_vars))
+    opt_vals = rng.uniform(size=len(nlp_._opt_vars))
+
+    solution = NLPSolution(layout=nlp_._layout, par_vals=par_vals, opt_vals=opt_vals,
+                           success=True, status='Solve_Succeeded', runtime=0)
+
+    values = reference_values(nlp_, par_vals, opt_vals)
+
+    # value of every variable
+    for var in nlp_._par_vars + nlp_._opt_vars:
+
+        if isinstance(var, NLPEpsilon):
+            continue
+
+        assert solution.value(var) == values[var.col_name][var.k], f'{name}: value of {var}'
+
+    # DataFrame
+    pd.testing.assert_frame_equal(solution.df, pd.DataFrame(values).sort_index(), check_index_type=False,
+                                  obj=f'{name}: NLPSolution.df')
+
+    # controls, including the steps before the first and after the last control variable
+    for k in range(-1, nlp_.N + 2):
+        for hold in (True, False):
+            assert solution.controls(k, hold=hold) == reference_controls(nlp_, opt_vals, k, hold), \
+                f'{name}: controls(k={k}, hold={hold})'
+
+    assert solution.optimal_controls == reference_controls(nlp_, opt_vals, 0, hold=False), \
+        f'{name}: optimal_controls'
+
+    print(f'{name:<20} OK ({len(nlp_._par_vars)} par vars, {len(nlp_._opt_vars)} opt vars)')
+
+
+if __name__ == '__main__':
+
+    for name, kwargs in variants.items():
+        check(name, **kwargs)
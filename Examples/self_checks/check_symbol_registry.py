@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from Examples.self_checks.config import *
+
+"""
+Self check of the SymbolRegistry: nlps that are built at the same time in several threads have to keep their
+symbols apart and yield the same solutions as nlps that are built one after another.
+The symbols that are created outside of an nlp are released by clear_default_registry().
+"""
+
+predictors = [TAirRoom_predictor(), P_heat_predictor()]
+
+variants = {
+    'MX':                   dict(),
+    'SX':                   dict(backend='SX'),
+    'long horizon':         dict(N=16),
+    'control_change_step':  dict(control_change_step=2),
+    'grid':                 dict(grid=[(4, 1), (2, 2)]),
+}
+
+
+def build(kwargs: dict) -> NLP:
+
+    nlp_ = nlp(**kwargs)
+    nlp_.build(predictors)
+
+    return nlp_
+
+
+def solve(nlp_: NLP) -> NLPSolution:
+
+    past, forecast = frames(nlp_.N)
+
+    return nlp_.solve(mpc(nlp_, forecast)._get_par_vals(past, forecast, time_offset))
+
+
+def check_registry(name: str, nlp_: NLP):
+    """ every variable of the nlp has to refer to the registry of the nlp """
+
+    for var in nlp_._par_vars + nlp_._opt_vars:
+        assert var.registry is nlp_.registry, f'{name}: {var} refers to another SymbolRegistry'
+
+
+def check_threads():
+
+    sequential = {name: build(kwargs) for name, kwargs in variants.items()}
+
+    with ThreadPoolExecutor(max_workers=len(variants)) as executor:
+        threaded = dict(zip(variants, executor.map(build, variants.values())))
+
+    registries = [nlp_.registry for nlp_ in threaded.values()]
+    assert len({id(registry) for registry in registries}) == len(registries), 'the nlps share a SymbolRegistry'
+
+    for name in variants:
+
+        check_registry(name, threaded[name])
+
+        assert len(threaded[name].registry) == len(sequential[name].registry), \
+            f'{name}: {threaded[name].registry} instead of {sequential[name].registry}'
+
+        expected = solve(sequential[name])
+        solution = solve(threaded[name])
+
+        assert expected.success and solution.success, name
+        np.testing.assert_allclose(solution.opt_vals, expected.opt_vals, rtol=0, atol=1e-8, err_msg=name)
+
+        print(f'{name:<20} OK ({threaded[name].registry})')
+
+
+def check_default_registry():
+
+    # the symbols of the nlp are not created outside of NLP.build() or NLP.load()
+    try:
+        NLPValue(feature=TAirRoom, k=0)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('NLPValue was created without an active SymbolRegistry')
+
+    # symbols that are created outside of an nlp are stored in the default registry until it is cleared
+    TAirRoom.source[-5]
+    assert len(active_registry()) > 0, 'the symbol was not added to the default registry'
+
+    clear_default_registry()
+    assert len(active_registry()) == 0, 'the default registry was not cleared'
+
+    # the predictors keep their symbols, so the nlp is built as before
+    nlp_ = build(dict())
+    check_registry('default registry', nlp_)
+    assert solve(nlp_).success, 'the nlp failed after the default registry was cleared'
+
+    print(f'{"default registry":<20} OK')
+
+
+if __name__ == '__main__':
+
+    check_threads()
+    check_default_registry()
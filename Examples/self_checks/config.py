@@ -0,0 +1,107 @@
+from ddmpc import *
+
+"""
+This script defines a small synthetic system for the self checks.
+It needs no FMU or BopTest server, the linear regression is fitted to generated data
+"""
+
+rng = np.random.default_rng(0)
+
+time_offset = 1546300800 + 60 * 60 * 10    # unix time stamp: 01.01.2019 10:00
+step_size = one_minute * 15
+
+""" Define the features (Variables) of the system """
+TAirRoom = Controlled(
+    source=Readable(name='Room Temperature', read_name='TAirRoom', plt_opts=red_line),
+    mode=Steady(day_target=273.15 + 21, night_target=273.15 + 21),
+)
+TAirRoom_change = Connection(Change(base=TAirRoom))
+
+u_heat = Control(
+    source=Readable(name='Heating', read_name='u_heat', plt_opts=blue_line),
+    lb=0, ub=1, default=0, cutoff=0.05,
+)
+u_heat_change = Connection(Change(base=u_heat))
+
+TAirOut = Disturbance(Readable(name='Ambient Temperature', read_name='TAirOut', plt_opts=light_red_line))
+
+P_heat = Controlled(
+    source=Readable(name='Heating Power', read_name='P_heat', plt_opts=grey_line),
+    mode=Steady(day_target=0, night_target=0),
+)
+
+model = Model(*Feature.all)
+
+""" Define the process models """
+inputs = Inputs(Input(TAirRoom, lag=2), Input(u_heat, lag=2), Input(TAirOut, lag=1))
+
+
+def TAirRoom_predictor() -> LinearRegression:
+    """ linear regression of the change of the room temperature, fitted to generated data """
+
+    training_data = TrainingData(inputs=inputs, output=Output(TAirRoom_change), step_size=step_size)
+
+    x = rng.uniform(size=(200, inputs.totalLag))
+    x[:, 0:2] = 290 + 8 * x[:, 0:2]
+    x[:, 4] = 270 + 20 * x[:, 4]
+    y = (0.02 * (x[:, 4] - x[:, 0]) + 0.8 * x[:, 2]).reshape(-1, 1)
+
+    training_data.xTrain, training_data.yTrain = x, y
+    training_data.xTest, training_data.yTest = x[:20], y[:20]
+
+    predictor = LinearRegression()
+    predictor.fit(training_data)
+
+    return predictor
+
+
+def P_heat_predictor() -> WhiteBox:
+    return WhiteBox(inputs=[u_heat.source], output=P_heat, output_expression=1000 * u_heat.source, step_size=step_size)
+
+
+def nlp(N: int = 8, **kwargs) -> NLP:
+
+    return NLP(
+        model=model,
+        N=N,
+        objectives=[
+            Objective(feature=TAirRoom, cost=Quadratic(weight=20)),
+            Objective(feature=P_heat, cost=Linear(weight=0.001)),
+            Objective(feature=u_heat_change, cost=Quadratic(weight=0.1)),
+        ],
+        constraints=[Constraint(feature=u_heat, lb=0, ub=1)],
+        **kwargs,
+    )
+
+
+def mpc(nlp_: NLP, forecast: pd.DataFrame) -> ModelPredictive:
+
+    return ModelPredictive(
+        nlp=nlp_,
+        step_size=step_size * nlp_.control_change_step,     # the model step size is step_size
+        forecast_callback=lambda horizon_in_seconds: forecast,
+        save_solution_plot=False,
+        save_solution_data=False,
+    )
+
+
+def frames(N: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """ returns the past and the forecast DataFrame at time_offset, every value is distinct """
+
+    past = pd.DataFrame({
+        'time':     time_offset + step_size * np.arange(-10, 1),
+        'TAirRoom': 292.0 + 0.1 * np.arange(11),
+        'u_heat':   0.3 + 0.01 * np.arange(11),
+        'TAirOut':  275.0 - 0.2 * np.arange(11),
+        'P_heat':   300.0 + np.arange(11),
+    })
+    past = model.process(past)
+
+    forecast = pd.DataFrame({
+        'time':     time_offset + step_size * np.arange(0, N + 1),
+        'TAirOut':  275 + np.sin(np.arange(N + 1)),
+    })
+    for controlled in model.controlled:
+        forecast = controlled._process(forecast)
+
+    return past, forecast
@@ -1,3 +1,7 @@
 from .costs import *
+from .library import *
 from .mpc import *
 from .nlp import *
+from .rti import *
+from .tuning import *
+from .workers import *
@@ -26,6 +26,11 @@ class Cost(ABC):
         """ the call function takes a casadi MX variable and applies the cost function to it """
         pass
 
+    @property
+    def even(self) -> bool:
+        """ True if the cost is smooth and cost(x) == cost(-x), so it can be applied to a deviation without slacks """
+        return False
+
 
 class Linear(Cost):
     """ linear cost function """
@@ -95,6 +100,10 @@ class Quadratic(Cost):
 
         return ((mx - self.offset) / self.norm) ** 2 * self.weight
 
+    @property
+    def even(self) -> bool:
+        return self.offset == 0
+
     def __str__(self):
         return f'{self.__class__.__name__}'
 
@@ -0,0 +1,168 @@
+""" library.py: Library of past solutions of the nlp for warm starts from similar parameter vectors """
+from typing import Optional
+
+import numpy as np
+
+from ddmpc.utils.file_manager import FileManager as file_manager
+from ddmpc.utils.pickle_handler import write_pkl, read_pkl
+
+
+class SolutionLibrary:
+    """
+    Stores pairs of parameter vectors and optimal primal and dual solutions of the nlp and returns the stored
+    solution with the nearest parameter vector. The distance is the root mean square of the differences,
+    each scaled by the standard deviation of that parameter within the library.
+    If the library is full, the entry that was used least recently is replaced.
+    """
+
+    def __init__(self, size: int = 2000, radius: float = 0.05):
+        """
+        :param size: maximum number of stored solutions
+        :param radius: maximum scaled distance of a stored solution to replace a valid warm start,
+                       without a valid warm start the nearest solution is always used
+        """
+
+        assert size > 0, 'The size of the SolutionLibrary must be positive.'
+
+        self.size:      int = size
+        self.radius:    float = radius
+
+        self._p:        Optional[np.ndarray] = None
+        self._x:        Optional[np.ndarray] = None
+        self._lam_x:    Optional[np.ndarray] = None
+        self._lam_g:    Optional[np.ndarray] = None
+        self._used:     np.ndarray = np.zeros(shape=(size,), dtype=int)
+        self._count:    int = 0
+        self._clock:    int = 0
+
+        # lookups, hits and the iterations of the solves started from the library and from other initial guesses
+        self.lookups:       int = 0
+        self.hits:          int = 0
+        self.iterations:    dict[str, list[int]] = {'library': list(), 'other': list()}
+
+    def __str__(self):
+        return f'SolutionLibrary({self._count}/{self.size})'
+
+    def __repr__(self):
+        return f'SolutionLibrary({self._count}/{self.size})'
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        """ removes all solutions, e.g. after the structure of the nlp changed """
+
+        self._p = self._x = self._lam_x = self._lam_g = None
+        self._used = np.zeros(shape=(self.size,), dtype=int)
+        self._count = 0
+
+    def _fits(self, p: np.ndarray, x: np.ndarray, lam_g: np.ndarray) -> bool:
+        """ True if the stored solutions belong to an nlp with the same dimensions """
+
+        return self._p.shape[1] == len(p) and self._x.shape[1] == len(x) and self._lam_g.shape[1] == len(lam_g)
+
+    def add(self, p: np.ndarray, x: np.ndarray, lam_x: np.ndarray, lam_g: np.ndarray):
+        """
+        stores a solution, the least recently used solution is replaced if the library is full
+        :param p: parameter vector of the nlp instance
+        :param x: optimal values of the optimization variables
+        :param lam_x: multipliers of the bounds
+        :param lam_g: multipliers of the constraints
+        """
+
+        p, x, lam_x, lam_g = (np.asarray(a, dtype=float).flatten() for a in (p, x, lam_x, lam_g))
+
+        if self._p is not None and not self._fits(p, x, lam_g):
+            print(f'{self} was built for a different nlp and is cleared.')
+            self.clear()
+
+        if self._p is None:
+            self._p = np.empty(shape=(self.size, len(p)))
+            self._x = np.empty(shape=(self.size, len(x)))
+            self._lam_x = np.empty(shape=(self.size, len(lam_x)))
+            self._lam_g = np.empty(shape=(self.size, len(lam_g)))
+
+        if self._count < self.size:
+            i = self._count
+            self._count += 1
+        else:
+            i = int(np.argmin(self._used))
+
+        self._clock += 1
+        self._p[i], self._x[i], self._lam_x[i], self._lam_g[i] = p, x, lam_x, lam_g
+        self._used[i] = self._clock
+
+    def nearest(self, p: np.ndarray, radius: float = np.inf) -> Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        returns x, lam_x and lam_g of the solution with the nearest parameter vector
+        :param p: parameter vector of the nlp instance
+        :param radius: maximum scaled distance, None is returned if no solution is closer
+        """
+
+        self.lookups += 1
+
+        p = np.asarray(p, dtype=float).flatten()
+
+        if self._count == 0 or self._p.shape[1] != len(p):
+            return None
+
+        stored = self._p[:self._count]
+
+        scale = stored.std(axis=0)
+        scale[scale == 0] = 1
+
+        distances = np.sqrt(np.mean(((stored - p) / scale) ** 2, axis=1))
+        i = int(np.argmin(distances))
+
+        if distances[i] > radius:
+            return None
+
+        self.hits += 1
+        self._clock += 1
+        self._used[i] = self._clock
+
+        return self._x[i].copy(), self._lam_x[i].copy(), self._lam_g[i].copy()
+
+    def record(self, iter_count: int, from_library: bool):
+        """ records the iterations of a solve to compare the starts from the library with the other starts """
+
+        self.iterations['library' if from_library else 'other'].append(int(iter_count))
+
+    @property
+    def hit_rate(self) -> float:
+        """ share of the lookups that returned a solution """
+
+        return self.hits / self.lookups if self.lookups > 0 else np.nan
+
+    @property
+    def iteration_savings(self) -> float:
+        """ mean iterations of the other starts minus the mean iterations of the starts from the library """
+
+        if not self.iterations['library'] or not self.iterations['other']:
+            return np.nan
+
+        return float(np.mean(self.iterations['other']) - np.mean(self.iterations['library']))
+
+    def summary(self):
+        """ prints the size, hit rate and iteration savings of the library """
+
+        print('SolutionLibrary:')
+        print(f'\tSolutions:          {self._count}/{self.size}')
+        print(f'\tLookups:            {self.lookups}')
+        print(f'\tHit rate:           {self.hit_rate:.2%}')
+        print(f'\tIteration savings:  {self.iteration_savings:.2f}')
+
+    def save(self, filename: str, override: bool = False):
+        """ saves the library to the solvers directory of the FileManager """
+
+        write_pkl(self, filename, file_manager.solvers_dir(), override)
+
+
+def load_SolutionLibrary(filename: str) -> SolutionLibrary:
+
+    library = read_pkl(filename, file_manager.solvers_dir())
+
+    assert isinstance(library, SolutionLibrary), \
+        f'Wrong type loaded. File at {file_manager.solvers_dir()}//{filename} is not from type SolutionLibrary'
+
+    return library
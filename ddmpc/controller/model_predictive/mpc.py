@@ -1,14 +1,32 @@
 """ mpc.py: Model Predictive Controller, Objectives and Constraints"""
 import os
+from collections import deque
+from time import perf_counter
 
 from ddmpc.controller.conventional import Controller
 from ddmpc.controller.model_predictive.nlp import NLP, NLPSolution
+from ddmpc.controller.model_predictive.rti import RealTimeIteration
+from ddmpc.data_handling.solution_store import SolutionStore
 from ddmpc.utils.plotting import *
 
 
 class ModelPredictive(Controller):
     """ model predictive controller that can handel multiple Objective's, Constraint's and Predictor's """
 
+    # wall times of the casadi function evaluations that are reported for every solve
+    solver_timings: tuple[str, ...] = (
+        't_wall_nlp_f',
+        't_wall_nlp_g',
+        't_wall_nlp_grad_f',
+        't_wall_nlp_jac_g',
+        't_wall_nlp_hess_l',
+    )
+
+    # the horizon is shortened if the estimated solve time exceeds this share of the time budget
+    # and extended if the estimate of the next longer horizon is below the slack share
+    budget_risk:    float = 0.8
+    budget_slack:   float = 0.4
+
     def __init__(
             self,
             nlp:                NLP,
@@ -18,8 +36,45 @@ class ModelPredictive(Controller):
             show_solution_plot: bool = False,
             save_solution_plot: bool = True,
             save_solution_data: bool = True,
+            solution_buffer_size: int = 96,
+            real_time_iteration: bool = False,
+            asynchronous:       bool = False,
+            async_timeout:      float = 0.0,
+            plot_workers:       int = 0,
+            plot_every:         int = 1,
+            max_pending_plots:  Optional[int] = None,
+            ladder:             Optional[list[NLP]] = None,
+            time_budget:        Optional[float] = None,
+            budget_window:      int = 10,
     ):
-        """ Model Predictive Controller """
+        """
+        Model Predictive Controller
+
+        :param save_solution_data:  if True, the solutions are stored in solutions.h5 in the experiment directory,
+                                    they can be read with load_solutions()
+        :param solution_buffer_size: number of solutions that are buffered before they are written to the disc,
+                                     call ModelPredictive.close() at the end of a run to write the remaining ones
+        :param real_time_iteration: if True, only one SQP iteration is performed per control step. The nlp is
+                                    linearized after every step and the next step only solves one QP,
+                                    see RealTimeIteration
+        :param asynchronous:        if True, the nlp is solved in a subprocess while the system keeps running.
+                                    Until a new solution arrives, the controls of the previous plan are
+                                    applied, shifted to the current step
+        :param async_timeout:       seconds every call waits for the running solve before falling back
+        :param plot_workers:        number of background processes that save the solution plots, with 0 the plots
+                                    are saved on the control thread. Shown plots are always drawn on the control
+                                    thread
+        :param plot_every:          only every n-th solution is plotted
+        :param max_pending_plots:   solutions that arrive while this many plots are pending are not plotted,
+                                    if None no plot is dropped
+        :param ladder:              built NLPs of the same model with shorter horizons than nlp. Every step, one of
+                                    the horizons is chosen by the time_budget. Each NLP is warm started from its own
+                                    last solution
+        :param time_budget:         seconds per step the solver may take. If the 90th percentile of the recent solve
+                                    times is at risk of exceeding it, the next shorter horizon is used, if the next
+                                    longer horizon is estimated to leave enough slack, it is used again
+        :param budget_window:       number of recent solve times per horizon the estimate is based on
+        """
 
         super(ModelPredictive, self).__init__(step_size=step_size)
 
@@ -29,17 +84,60 @@ class ModelPredictive(Controller):
         self._forecast_callback:    Callable = forecast_callback
 
         self._solution_plotter:     Plotter = solution_plotter
+        self._background_plotter:   Optional[BackgroundPlotter] = None
+
+        self.plot_workers:      int = plot_workers
+        self.plot_every:        int = plot_every
+        self.max_pending_plots: Optional[int] = max_pending_plots
+        self._plot_count:       int = 0
 
         self.show_solution_plot: bool = show_solution_plot
         self.save_solution_plot: bool = save_solution_plot
         self.save_solution_data: bool = save_solution_data
+        self.solution_buffer_size: int = solution_buffer_size
+        self._solution_store: Optional[SolutionStore] = None
+
+        self.real_time_iteration: bool = real_time_iteration
+        self._rti: Optional[RealTimeIteration] = None
+
+        self.asynchronous: bool = asynchronous
+        self.async_timeout: float = async_timeout
+        assert not (asynchronous and real_time_iteration), 'Please choose either asynchronous or real_time_iteration.'
+
+        # the plan that is currently applied and the time it was calculated for
+        self._plan: Optional[tuple[NLPSolution, int]] = None
+        self._submit_time: Optional[int] = None
 
-        if os.path.exists(str(Path(file_manager.experiment_dir(), 'solutions.csv'))):
-            os.remove(str(Path(file_manager.experiment_dir(), 'solutions.csv')))
+        # number of calls and calls where the controls were taken from an older plan
+        self.calls: int = 0
+        self.fallbacks: int = 0
+
+        # nlps sorted from the longest to the shortest horizon and their recent solve times
+        self._ladder: list[NLP] = sorted([nlp, *(ladder or [])], key=lambda n: n.N, reverse=True)
+        self._runtimes: list[deque] = [deque(maxlen=budget_window) for _ in self._ladder]
+        self.time_budget: Optional[float] = time_budget
+
+        if len(self._ladder) > 1:
+            assert not (asynchronous or real_time_iteration), \
+                'The ladder can not be combined with asynchronous or real_time_iteration.'
+            assert all(n.control_change_step == nlp.control_change_step for n in self._ladder), \
+                'All NLPs of the ladder must use the same control_change_step.'
+            assert all(n.solver is not None for n in self._ladder), 'Please build all NLPs of the ladder first.'
+
+        self.nlp = self._ladder[0]
 
     def __str__(self):
         return f'ModelPredictive()'
 
+    @property
+    def fallback_rate(self) -> float:
+        """ share of the calls where the controls were taken from a previous plan """
+
+        if self.calls == 0:
+            return 0.0
+
+        return self.fallbacks / self.calls
+
     def __call__(self, past: pd.DataFrame) -> tuple[dict, dict]:
 
         if len(past) <= self.nlp.max_lag:
@@ -47,17 +145,62 @@ class ModelPredictive(Controller):
 
         current_time = past['time'].iloc[-1]
 
+        self._choose_horizon()
+
         # get the forecast and past data
+        start_time = perf_counter()
         forecast = self._forecast_callback(horizon_in_seconds=int(self.nlp.N*self.step_size_model))
+        forecast_time = perf_counter() - start_time
 
-        # solve the nlp
+        start_time = perf_counter()
         par_vals: list[float] = self._get_par_vals(past, forecast, current_time)
-        solution: NLPSolution = self.nlp.solve(par_vals)
+        parameter_time = perf_counter() - start_time
+
+        timings: dict[str, float] = {'forecast_time': forecast_time, 'parameter_time': parameter_time}
+
+        # solve the nlp
+        if self.asynchronous:
+            controls, additional_info = self._call_asynchronous(par_vals, current_time)
+            return controls, {**timings, **additional_info}
+
+        if self.real_time_iteration:
+            if self._rti is None:
+                self._rti = RealTimeIteration(nlp=self.nlp)
+            solution: NLPSolution = self._rti.feedback(par_vals)
+        else:
+            solution: NLPSolution = self.nlp.solve(par_vals)
+
+        self.calls += 1
+
+        self._runtimes[self._ladder.index(self.nlp)].append(solution.runtime)
+
+        if len(self._ladder) > 1:
+            timings['horizon'] = self.nlp.N
+
+        # the solver did not return in time, follow the previous plan instead
+        if solution.status == 'Deadline_Exceeded':
+            controls, additional_info = self._apply_plan(current_time)
+            additional_info['success'] = False
+            additional_info['runtime'] = solution.runtime
+            return controls, {**timings, **additional_info, **self._solver_info(solution)}
+
+        self._plan = (solution, current_time)
 
         # retrieve the optimal controls
         controls: dict[str, float] = solution.optimal_controls
 
-        additional_info: dict[str, float] = {'success': solution.success, 'runtime': solution.runtime}
+        additional_info: dict[str, float] = {
+            'success': solution.success,
+            'runtime': solution.runtime,
+            **timings,
+            **self._solver_info(solution),
+        }
+
+        # linearize for the next step, after the controls are known
+        if self.real_time_iteration:
+            start_time = perf_counter()
+            self._rti.prepare()
+            additional_info['preparation_time'] = perf_counter() - start_time
 
         # append the solution to the solutions and save them to the disc
         self._save_solution(solution.df, current_time)
@@ -67,6 +210,122 @@ class ModelPredictive(Controller):
 
         return controls, additional_info
 
+    def _choose_horizon(self):
+        """ moves one step down the ladder if the time budget is at risk and one step up if there is slack """
+
+        if self.time_budget is None or len(self._ladder) == 1:
+            return
+
+        i = self._ladder.index(self.nlp)
+
+        if i < len(self._ladder) - 1 and self._estimate(i) > self.budget_risk * self.time_budget:
+            i += 1
+        elif i > 0 and self._estimate(i - 1) < self.budget_slack * self.time_budget:
+            i -= 1
+
+        self.nlp = self._ladder[i]
+
+    def _estimate(self, i: int) -> float:
+        """
+        estimates the solve time of the i-th nlp of the ladder by the 90th percentile of its recent solve times.
+        Horizons without solve times are estimated from the nearest horizon, assuming a linear scaling with N
+        """
+
+        observed = [j for j, runtimes in enumerate(self._runtimes) if runtimes]
+
+        if not observed:
+            return 0.0
+
+        j = min(observed, key=lambda j: abs(j - i))
+
+        return float(np.percentile(self._runtimes[j], 90)) * self._ladder[i].N / self._ladder[j].N
+
+    def _call_asynchronous(self, par_vals: list[float], current_time: int) -> tuple[dict, dict]:
+        """ submits a new solve if none is running and applies the most recent plan """
+
+        try:
+            if not self.nlp.pending:
+                self.nlp.submit(par_vals)
+                self._submit_time = current_time
+
+            solution: Optional[NLPSolution] = self.nlp.collect(timeout=self.async_timeout)
+
+        except (RuntimeError, BrokenPipeError, EOFError) as e:
+            # the SolverProcess died and was restarted, the previous plan is followed until the next solve
+            print(f'solving in the SolverProcess failed: {e}')
+
+            self.calls += 1
+
+            controls, additional_info = self._apply_plan(current_time)
+            if not additional_info['fallback']:
+                self.fallbacks += 1
+
+            return controls, {**additional_info, 'success': False, 'fallback': True, 'solver_error': str(e)}
+
+        if solution is not None:
+
+            # failed solutions only replace the plan if there is none yet
+            if solution.success or self._plan is None:
+                self._plan = (solution, self._submit_time)
+
+            self._save_solution(solution.df, self._submit_time)
+            self._plot_solution(solution.df, self._submit_time)
+
+        self.calls += 1
+
+        controls, additional_info = self._apply_plan(current_time)
+
+        # the solver statistics are only reported in the step the solution arrived
+        if solution is not None:
+            additional_info.update(self._solver_info(solution))
+
+        return controls, additional_info
+
+    def _solver_info(self, solution: NLPSolution) -> dict:
+        """
+        returns the iteration count, return status and wall times of the solver call.
+        The solver_internal_time is the part of the runtime that is not spent in the function evaluations,
+        i.e. the time inside the solver itself, e.g. the linear solves, the line search and the barrier updates
+        """
+
+        info = {
+            'iter_count':       solution.stats.get('iter_count', np.nan),
+            'return_status':    solution.status,
+        }
+
+        for key in self.solver_timings:
+            info[key] = solution.stats.get(key, np.nan)
+
+        info['solver_internal_time'] = solution.runtime - np.nansum([info[key] for key in self.solver_timings])
+
+        return info
+
+    def _apply_plan(self, current_time: int) -> tuple[dict, dict]:
+        """ returns the controls of the last plan, shifted to the current time """
+
+        # no plan available yet, apply the default controls
+        if self._plan is None:
+            self.fallbacks += 1
+            controls = {c.source.col_name: c.default for c in self.nlp.model.controls}
+            return controls, {'success': False, 'fallback': True, 'plan_age': None}
+
+        plan, plan_time = self._plan
+        plan_age = int(round((current_time - plan_time) / self.step_size_model))
+
+        if plan_age > 0:
+            self.fallbacks += 1
+
+        controls: dict[str, float] = plan.controls(plan_age)
+
+        additional_info: dict[str, float] = {
+            'success':  plan.success,
+            'runtime':  plan.runtime,
+            'fallback': plan_age > 0,
+            'plan_age': plan_age,
+        }
+
+        return controls, additional_info
+
     def _plot_solution(self, df: pd.DataFrame, current_time: int):
 
         if not self.save_solution_plot and not self.show_solution_plot:
@@ -81,82 +340,157 @@ class ModelPredictive(Controller):
         # add the time column to the DataFrame
         df['time'] = current_time + df.index * self.step_size_model
 
+        save_name = f'solutions\\{file_manager.current_time()}-mpc_solution.svg'
+
+        # saving is offloaded to the background processes, which also handle plot_every
+        if self.plot_workers > 0 and not self.show_solution_plot:
+
+            if self._background_plotter is None:
+                self._background_plotter = BackgroundPlotter(
+                    plotter=self._solution_plotter,
+                    workers=self.plot_workers,
+                    every=self.plot_every,
+                    max_pending=self.max_pending_plots,
+                )
+
+            self._background_plotter.submit(df, current_time=current_time, save_name=save_name)
+            return
+
+        self._plot_count += 1
+        if (self._plot_count - 1) % self.plot_every != 0:
+            return
+
         self._solution_plotter.plot(
             df,
             save_plot=self.save_solution_plot,
             show_plot=self.show_solution_plot,
             current_time=current_time,
-            save_name=f'solutions\\{file_manager.current_time()}-mpc_solution.svg'
+            save_name=save_name,
         )
 
     def _get_par_vals(self, past: pd.DataFrame, forecast: pd.DataFrame, current_time: int) -> list[float]:
-        """ calculates the input list for the nlp """
+        """ calculates the input list for the nlp by gathering every column of the par vars at once """
+
+        par_vals = np.empty(len(self.nlp._par_vars))
+
+        # sorted time columns of the past and forecast DataFrame
+        lookup: dict[bool, tuple[np.ndarray, np.ndarray]] = dict()
 
-        par_vars = list()
+        for col_name, from_past, feature, indices, ks, lengths in self.nlp._gather_plan:
 
-        # iterate over all par vars
-        for nlp_var in self.nlp._par_vars:
+            # if k <= 0 use the past DataFrame, if k > 0 use the forecast DataFrame
+            if not from_past and col_name not in forecast.columns:
+                forecast = feature.source.process(forecast)
 
-            t = current_time + self.step_size_model * nlp_var.k
+            df = past if from_past else forecast
 
-            # if k <= 0 use the past DataFrame
-            if nlp_var.k <= 0:
-                value = past.loc[past['time'] == t, nlp_var.col_name].values
+            if from_past not in lookup:
+                times = df['time'].values
+                order = np.argsort(times, kind='stable')
+                lookup[from_past] = (times[order], order)
 
-                if len(value) != 1:
-                    print(f'Error occurred while getting par var {nlp_var}')
-                    print('k =', nlp_var.k)
-                    print('time =', int(t), datetime.datetime.fromtimestamp(t))
-                    print('current_time=', int(current_time), datetime.datetime.fromtimestamp(current_time))
-                    print(nlp_var.col_name)
+            times, order = lookup[from_past]
 
-                    past['t'] = past['time'].apply(func=datetime.datetime.fromtimestamp)
-                    pd.set_option('display.float_format', lambda x: '%.2f' % x)
+            try:
+                column = df[col_name].values
+            except KeyError:
+                raise KeyError(f'{self.nlp._par_vars[indices[0]]} with col_name={col_name} was not found in '
+                               f'{df.columns}.')
 
-                    print(past.tail(n=self.nlp.max_lag).to_string())
+            # on a non-uniform grid, the forecast is averaged over the interval of every par var
+            values = np.zeros(len(ks))
+            for j in range(lengths.max()):
 
-                    raise ValueError('Error occurred, while getting par vars')
+                within = j < lengths
+                t = current_time + self.step_size_model * (ks[within] + j)
 
-            # if k > 0 use the forecast DataFrame
-            else:
+                # every time must appear exactly once
+                first = np.searchsorted(times, t, side='left')
+                found = np.searchsorted(times, t, side='right') - first == 1
 
-                if nlp_var.col_name not in forecast.columns:
-                    forecast = nlp_var.feature.source.process(forecast)
+                if not found.all():
+                    nlp_var = self.nlp._par_vars[indices[within][~found][0]]
+                    self._raise_missing(nlp_var, float(t[~found][0]), past, forecast, current_time)
 
-                try:
-                    value = forecast.loc[forecast['time'] == t, nlp_var.col_name].values
-                    assert len(value) == 1,\
-                        f'{nlp_var} with col_name={nlp_var.col_name} at t={t} was not found in: \n {forecast.to_string()}'
+                values[within] += column[order[first]]
 
-                except KeyError:
-                    raise KeyError(f'{nlp_var} with col_name={nlp_var.col_name} was not found in {forecast.columns}.')
+            par_vals[indices] = values / lengths
 
-            assert len(value) == 1
-            assert value[0] is not None
-            assert value[0] != np.nan, f'Detected nan for {nlp_var}'
+        return par_vals.tolist()
 
-            par_vars.append(float(value))
+    def _raise_missing(self, nlp_var, t: float, past: pd.DataFrame, forecast: pd.DataFrame, current_time: int):
+        """ raises an error for a par var whose time is not found exactly once """
 
-        return par_vars
+        if nlp_var.k > 0:
+            raise AssertionError(
+                f'{nlp_var} with col_name={nlp_var.col_name} at t={t} was not found in: \n {forecast.to_string()}')
+
+        print(f'Error occurred while getting par var {nlp_var}')
+        print('k =', nlp_var.k)
+        print('time =', int(t), datetime.datetime.fromtimestamp(t))
+        print('current_time=', int(current_time), datetime.datetime.fromtimestamp(current_time))
+        print(nlp_var.col_name)
+
+        past['t'] = past['time'].apply(func=datetime.datetime.fromtimestamp)
+        pd.set_option('display.float_format', lambda x: '%.2f' % x)
+
+        print(past.tail(n=self.nlp.max_lag).to_string())
+
+        raise ValueError('Error occurred, while getting par vars')
 
     def _save_solution(self, df: pd.DataFrame, current_time: int):
+        """ buffers the solution in the SolutionStore, which writes it to solutions.h5 every few steps """
 
         if not self.save_solution_data:
             return
 
-        filename: str = 'solutions'
-        directory: str = file_manager.experiment_dir()
+        if self._solution_store is None:
+            self._solution_store = SolutionStore(
+                filepath=Path(file_manager.experiment_dir(), 'solutions.h5'),
+                step_size=self.step_size_model,
+                buffer_size=self.solution_buffer_size,
+            )
 
-        df['period'] = current_time
-        df['forecast_time'] = df.index * self.step_size_model
+        self._solution_store.append(period=current_time, df=df)
 
-        cols = list(df.columns)
-        cols.insert(0, cols.pop(cols.index('forecast_time')))
-        cols.insert(0, cols.pop(cols.index('period')))
-        df = df[cols]
+    def close(self):
+        """ writes the buffered solutions to the disc, waits for the pending plots and stops the SolverProcesses """
 
-        if os.path.exists(directory + f'\\{filename}.csv'):
-            df.to_csv(directory + f'\\{filename}.csv', mode='a', index=False, header=False)
-        else:
-            df.to_csv(directory + f'\\{filename}.csv', mode='a', index=False, header=True)
+        if self._solution_store is not None:
+            self._solution_store.flush()
+
+        if self._background_plotter is not None:
+            self._background_plotter.close()
+            self._background_plotter = None
+
+        for nlp in self._ladder:
+            nlp.close()
+
+
+def solver_summary(df: pd.DataFrame, percentiles: tuple[int, ...] = (50, 90, 99)) -> pd.DataFrame:
+    """
+    summarizes the timings and iteration counts of the ModelPredictive controller in a run DataFrame
+    :param df: DataFrame of a run, e.g. DataContainer.df, with the additional columns of ModelPredictive
+    :param percentiles: percentiles that are calculated for every column
+    :return: DataFrame with count, mean, percentiles and max of every column found in df
+    """
+
+    columns = ['forecast_time', 'parameter_time', 'runtime', *ModelPredictive.solver_timings,
+               'solver_internal_time', 'iter_count', 'horizon']
+
+    rows = dict()
+    for col in columns:
+
+        if col not in df.columns:
+            continue
+
+        values = pd.to_numeric(df[col], errors='coerce').dropna().values
+
+        row = {'count': len(values), 'mean': values.mean() if len(values) > 0 else np.nan}
+        for q in percentiles:
+            row[f'p{q}'] = np.percentile(values, q) if len(values) > 0 else np.nan
+        row['max'] = values.max() if len(values) > 0 else np.nan
+
+        rows[col] = row
 
+    return pd.DataFrame.from_dict(rows, orient='index')
@@ -1,19 +1,52 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 import time
+import tracemalloc
 import warnings
 from abc import ABC, abstractmethod
-from typing import Optional, Iterator
+from pathlib import Path
+from typing import Callable, Optional, Iterator
 from typing import Union
 
+import casadi
 import numpy as np
 import pandas as pd
-from casadi import MX, inf, nlpsol, vertcat
+from casadi import MX, SX, Function, conic_options, dot, gradient, horzcat, horzsplit, inf, is_linear, is_quadratic, \
+    jacobian_sparsity, nlpsol, qpsol, repmat, substitute, vertcat
 
 import ddmpc.utils.formatting as fmt
 from ddmpc.controller.model_predictive.costs import Cost, AbsoluteLinear
+from ddmpc.controller.model_predictive.library import SolutionLibrary
+from ddmpc.controller.model_predictive.workers import SolverProcess
 from ddmpc.modeling.features.features import Feature, Source, Constructed, Controlled, Control
+from ddmpc.modeling.features.sources import SymbolRegistry, active_registry
 from ddmpc.modeling.modeling import Model
 from ddmpc.modeling.predicting import Predictor
+from ddmpc.utils.file_manager import FileManager as file_manager
 from ddmpc.utils.modes import Economic, Steady
+from ddmpc.utils.pickle_handler import write_pkl, read_pkl
+
+try:
+    import resource
+except ImportError:
+    # not available on windows, the memory statistics of NLP.build() are NaN
+    resource = None
+
+
+def _peak_rss() -> float:
+    """ returns the peak resident memory of the process in bytes, NaN if it is not available """
+
+    if resource is None:
+        return np.nan
+
+    # kilobytes on linux, bytes on macos
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return float(peak if sys.platform == 'darwin' else peak * 1024)
 
 
 class Objective:
@@ -23,14 +56,17 @@ class Objective:
             self,
             feature: Feature,
             cost: Cost,
+            slack_free: Optional[bool] = None,
     ):
         """
         :param feature: feature to weight in the cost function
         :param cost: cost function to apply to the feature
+        :param slack_free: overrides the slack_free option of the NLP for this objective
         """
 
         self.feature: Feature = feature
         self.cost: Cost = cost
+        self.slack_free: Optional[bool] = slack_free
 
     def __str__(self):
         return f'Objective(feature={self.feature})'
@@ -75,6 +111,8 @@ class Constraint:
             expression=self.feature.source[k],
             lb=self.lb,
             ub=self.ub,
+            k=k,
+            origin=str(self),
         )
 
     def __str__(self):
@@ -104,8 +142,13 @@ class NLPVariable(ABC):
         self.feature = feature
         self.k = k
 
-        # call the mx variable to instantiate it
-        a = self.feature.source[self.k]
+        # simple bounds, only passed to the solver for optimization variables
+        self.lb: float = -inf
+        self.ub: float = inf
+
+        # the SymbolRegistry of the nlp, so the symbol is also found after the build
+        self.registry: SymbolRegistry = active_registry(required=True)
+        self.registry.get(self.feature.source, self.k)
 
     @property
     @abstractmethod
@@ -146,7 +189,7 @@ class NLPValue(NLPVariable):
 
     @property
     def mx(self) -> MX:
-        return self.feature.source[self.k]
+        return self.registry.get(self.feature.source, self.k)
 
     @property
     def col_name(self):
@@ -168,7 +211,7 @@ class NLPTarget(NLPVariable):
     ):
         super(NLPTarget, self).__init__(feature=feature, k=k)
 
-        self._mx: MX = MX.sym(f'MX({self.__class__.__name__}({self.feature}) at k={"%+d" % k})')
+        self._mx: Union[MX, SX] = self.registry.symbolic.sym(f'MX({self.__class__.__name__}({self.feature}) at k={"%+d" % k})')
 
     @property
     def mx(self) -> MX:
@@ -195,7 +238,7 @@ class NLPLowerBound(NLPVariable):
     ):
         super(NLPLowerBound, self).__init__(feature=feature, k=k)
 
-        self._mx: MX = MX.sym(f'{self.__class__.__name__}({self.feature})[{"%+d" % k}]')
+        self._mx: Union[MX, SX] = self.registry.symbolic.sym(f'{self.__class__.__name__}({self.feature})[{"%+d" % k}]')
 
     @property
     def mx(self) -> MX:
@@ -222,7 +265,7 @@ class NLPUpperBound(NLPVariable):
     ):
         super(NLPUpperBound, self).__init__(feature=feature, k=k)
 
-        self._mx: MX = MX.sym(f'{self.__class__.__name__}({self.feature})[{"%+d" % k}]')
+        self._mx: Union[MX, SX] = self.registry.symbolic.sym(f'{self.__class__.__name__}({self.feature})[{"%+d" % k}]')
 
     def __str__(self):
         return f'{__class__.__name__}({self.feature}[{"%+d" % self.k}])'
@@ -249,7 +292,7 @@ class NLPEpsilon(NLPVariable):
     ):
         super(NLPEpsilon, self).__init__(feature=feature, k=k)
 
-        self._mx: MX = MX.sym(f'{self.__class__.__name__}({self.feature})[{"%+d" % k}]')
+        self._mx: Union[MX, SX] = self.registry.symbolic.sym(f'{self.__class__.__name__}({self.feature})[{"%+d" % k}]')
 
     def __str__(self):
         return f'{__class__.__name__}({self.feature}[{"%+d" % self.k}])'
@@ -273,12 +316,16 @@ class NLPConstraint:
             expression: MX,
             lb: float = 0.0,
             ub: float = 0.0,
+            k: int = 0,
+            origin: str = '',
     ):
-        """ constraint for the nlp """
+        """ constraint for the nlp, k is the time step it belongs to and origin the object it was created by """
 
         self.expression: MX = expression
         self.lb: float = lb
         self.ub: float = ub
+        self.k: int = k
+        self.origin: str = origin
 
     def __str__(self):
         return f'{self.__class__.__name__}({self.lb} < {self.expression} < {self.ub})'
@@ -302,45 +349,112 @@ class NLPObjective:
         return f'{self.__class__.__name__}({self.expression})'
 
 
-class NLPSolution:
+class SolutionLayout:
+    """
+    Index map from (column, k) to the positions in the concatenated vector [par_vals, opt_vals].
+    It is calculated once by NLP.build() and shared by every NLPSolution.
+    """
 
     def __init__(
             self,
-            par_vars: list,
-            opt_vars: list,
-            par_vals: list,
-            opt_vals: list,
+            par_vars: list[NLPVariable],
+            opt_vars: list[NLPVariable],
             inp_map: dict[Predictor, dict[int, list[NLPVariable]]],
-
-            success: bool,
-            status: str,
-            runtime: float,
     ):
-        assert len(par_vals) == len(par_vars)
-        assert len(opt_vals) == len(opt_vars)
 
-        self.par_vals = par_vals
-        self.opt_vals = opt_vals
+        self.par_vars: list[NLPVariable] = par_vars
+        self.opt_vars: list[NLPVariable] = opt_vars
+        self.inp_map: dict[Predictor, dict[int, list[NLPVariable]]] = inp_map
 
-        self.par: Iterator = zip(par_vars, par_vals)
-        self.opt: Iterator = zip(opt_vars, opt_vals)
-
-        self.hashmap = dict()
-        for var, val in zip(par_vars + opt_vars, par_vals + opt_vals):
+        # position of every (col_name, k), later variables overwrite earlier ones
+        self.positions: dict[tuple[str, int], int] = dict()
+        for i, var in enumerate(par_vars + opt_vars):
 
             if isinstance(var, NLPEpsilon):
                 continue
 
-            if var.col_name not in self.hashmap:
-                self.hashmap[var.col_name] = dict()
+            self.positions[(var.col_name, var.k)] = i
+
+        self.columns: list[str] = list(dict.fromkeys(col_name for col_name, _ in self.positions))
+        self.ks: np.ndarray = np.array(sorted({k for _, k in self.positions}), dtype=int)
+
+        # positions of the DataFrame cells, missing cells point to the NaN behind the last opt val
+        col_idx = {col_name: i for i, col_name in enumerate(self.columns)}
+        k_idx = {k: i for i, k in enumerate(self.ks)}
+        self.grid: np.ndarray = np.full(shape=(len(self.ks), len(self.columns)), fill_value=-1, dtype=int)
+        for (col_name, k), i in self.positions.items():
+            self.grid[k_idx[k], col_idx[col_name]] = i
+
+        # positions of the controls in opt_vals, sorted by k for every column
+        self.controls: dict[str, tuple[Control, np.ndarray, np.ndarray]] = dict()
+        for i, var in enumerate(opt_vars):
+
+            if not isinstance(var, NLPValue) or not isinstance(var.feature, Control):
+                continue
+
+            control, ks, indices = self.controls.setdefault(var.col_name, (var.feature, [], []))
+            ks.append(var.k)
+            indices.append(i)
 
-            self.hashmap[var.col_name][var.k] = float(val)
+        for col_name, (control, ks, indices) in self.controls.items():
+            order = np.argsort(ks, kind='stable')
+            self.controls[col_name] = (control, np.array(ks, dtype=int)[order], np.array(indices, dtype=int)[order])
+
+    def __str__(self):
+        return f'SolutionLayout(columns={len(self.columns)}, ks={len(self.ks)})'
+
+    def __repr__(self):
+        return f'SolutionLayout(columns={len(self.columns)}, ks={len(self.ks)})'
 
-        self.inp_vals = inp_map
+
+class NLPSolution:
+
+    def __init__(
+            self,
+            layout: SolutionLayout,
+            par_vals: Union[list, np.ndarray],
+            opt_vals: Union[list, np.ndarray],
+
+            success: bool,
+            status: str,
+            runtime: float,
+            stats: Optional[dict] = None,
+    ):
+        """
+        :param layout: index map of the nlp, see NLP.build()
+        :param stats: statistics of the solver call, e.g. iter_count and the casadi t_wall_* timings
+        """
+
+        par_vals = np.asarray(par_vals, dtype=float).flatten()
+        opt_vals = np.asarray(opt_vals, dtype=float).flatten()
+
+        assert len(par_vals) == len(layout.par_vars)
+        assert len(opt_vals) == len(layout.opt_vars)
+
+        self.layout: SolutionLayout = layout
+
+        # par vals and opt vals followed by NaN for the missing cells of the DataFrame, concatenated once.
+        # par_vals and opt_vals are views onto it
+        self._values: np.ndarray = np.concatenate([par_vals, opt_vals, [np.nan]])
+        self.par_vals: np.ndarray = self._values[:len(par_vals)]
+        self.opt_vals: np.ndarray = self._values[len(par_vals):-1]
 
         self.success: bool = success
         self.status: str = status
         self.runtime: float = runtime
+        self.stats: dict = stats if stats is not None else dict()
+
+    @property
+    def par(self) -> Iterator:
+        return zip(self.layout.par_vars, self.par_vals)
+
+    @property
+    def opt(self) -> Iterator:
+        return zip(self.layout.opt_vars, self.opt_vals)
+
+    @property
+    def inp_vals(self) -> dict[Predictor, dict[int, list[NLPVariable]]]:
+        return self.layout.inp_map
 
     def __str__(self):
         return f'NLPSolution(runtime={self.runtime})'
@@ -350,33 +464,45 @@ class NLPSolution:
 
     @property
     def optimal_controls(self) -> dict[str, float]:
+
+        return self.controls(k=0, hold=False)
+
+    def controls(self, k: int, hold: bool = True) -> dict[str, float]:
+        """
+        returns the controls of this solution that are applied k steps after it was calculated,
+        used to keep following a previous plan while a new solution is not available yet
+        :param k: step of the horizon
+        :param hold: if True and k is not a control step, the previous control step is used
+        """
+
         controls = dict()
 
-        for var, val in self.opt:
-            condition1 = isinstance(var.feature, Control)
-            condition2 = var.k == 0
-            condition3 = isinstance(var, NLPValue)
+        for col_name, (control, ks, indices) in self.layout.controls.items():
+
+            i = np.searchsorted(ks, k, side='right') - 1
 
-            if condition1 and condition2 and condition3:
-                if var.feature.cutoff is not None:
-                    if val <= var.feature.cutoff:
-                        val = var.feature.default
-                controls[var.col_name] = val
+            if i < 0 or (not hold and ks[i] != k):
+                continue
+
+            val = float(self.opt_vals[indices[i]])
+
+            if control.cutoff is not None:
+                if val <= control.cutoff:
+                    val = control.default
+
+            controls[col_name] = val
 
         return controls
 
     def value(self, nlp_val: NLPVariable) -> float:
 
-        return self.hashmap[nlp_val.col_name][nlp_val.k]
+        return float(self._values[self.layout.positions[(nlp_val.col_name, nlp_val.k)]])
 
     @property
     def df(self) -> pd.DataFrame:
         """ turns the solution back to a DataFrame """
 
-        df = pd.DataFrame(self.hashmap)
-        df.sort_index(inplace=True)
-
-        return df
+        return pd.DataFrame(self._values[self.layout.grid], index=self.layout.ks, columns=self.layout.columns)
 
     """
     def predictions(self, predictions: list[Prediction]):
@@ -407,6 +533,37 @@ class NLPSolution:
 
 class NLP:
 
+    compiler: str = 'gcc'                           # system C compiler used for the code generation
+    compiler_flags: tuple = ('-fPIC', '-O1')        # -O1 compiles much faster than -O3 at a similar speed
+
+    # ipopt options for the shifted warm start, options passed to build() take precedence.
+    # A small initial barrier parameter keeps ipopt close to the shifted solution instead of re-centering it.
+    warm_start_options: dict = {
+        'ipopt.warm_start_init_point':      'yes',
+        'ipopt.warm_start_bound_push':      1e-6,
+        'ipopt.warm_start_mult_bound_push': 1e-6,
+        'ipopt.mu_init':                    1e-4,
+    }
+
+    # if True, the peak memory of the python allocations during NLP.build() is traced with tracemalloc.
+    # This slows down the python part of the build and therefore its timings, casadi's own allocations are not traced
+    trace_memory: bool = False
+
+    # standard deviation of the random initial guesses of the multi start, relative to the width of the bounds
+    start_perturbation: float = 0.1
+
+    # default options of the qp solvers, a failed solve is reported in the stats instead of raising an error.
+    # The default tolerances of osqp are too loose to keep the bounds, so they are tightened and the solution polished
+    qp_options: dict = {
+        'qrqp':     {'print_iter': False, 'print_header': False, 'print_info': False, 'error_on_fail': False},
+        'osqp':     {'osqp': {'verbose': False, 'eps_abs': 1e-6, 'eps_rel': 1e-6, 'polish': True, 'max_iter': 10000},
+                     'error_on_fail': False},
+        'qpoases':  {'printLevel': 'none', 'sparse': True, 'error_on_fail': False},
+    }
+
+    # maximum violation of the variable bounds by a successful qp solution, larger violations count as failed solve
+    qp_bound_tolerance: float = 1e-6
+
     def __init__(
             self,
             N: int,
@@ -414,7 +571,87 @@ class NLP:
             control_change_step: int = 1,
             objectives: list[Objective] = None,
             constraints: list[Constraint] = None,
+            parametric_predictors: bool = False,
+            backend: str = 'MX',
+            code_generation: bool = False,
+            slack_free: bool = False,
+            ordering: str = 'feature',
+            map_predictions: Optional[str] = None,
+            n_threads: int = 1,
+            warm_start: str = 'previous',
+            deadline: Optional[float] = None,
+            grid: Optional[list[tuple[int, int]]] = None,
+            qp_solver: Optional[str] = None,
+            multi_start: int = 1,
+            library: Optional[SolutionLibrary] = None,
     ):
+        """
+        :param N: prediction horizon
+        :param model: model of the system
+        :param control_change_step: number of time steps the controls are kept constant
+        :param objectives: objectives for the cost function
+        :param constraints: constraints for the optimization problem
+        :param parametric_predictors: if True, the trained parameters of the predictors are passed to the solver as
+                                      parameters, so retrained predictors do not require NLP.build() again
+        :param backend: symbolic type used to build the nlp, either 'MX' or 'SX'. With 'SX' the whole problem
+                        is built from scalar expressions, which are evaluated much faster by the solver
+        :param code_generation: if True, the objective, constraints and their derivatives are generated as C code and
+                                compiled with NLP.compiler. The binaries are cached in FileManager.solvers_dir()
+                                and reused by every later build with the same problem structure
+        :param slack_free: if True, Steady mode objectives with an even cost (e.g. Quadratic) and objectives of
+                           features that are not controlled are applied directly to the feature instead of slack
+                           variables. Economic mode and AbsoluteLinear costs always use slack variables
+        :param ordering: order of the optimization variables and constraints, either 'feature' (grouped by feature,
+                         predictor and objective) or 'stage' (grouped by time step k). The stage ordering yields
+                         a banded KKT system, which reduces the fill-in of the linear solver for long horizons
+        :param map_predictions: if None, every predictor is inlined for each of the N time steps. Otherwise, the
+                                predictors are wrapped in a casadi Function that is evaluated for all time steps
+                                with Function.map, using 'serial', 'unroll' or 'thread' evaluation
+        :param n_threads: maximum number of threads for map_predictions='thread'
+        :param warm_start: 'previous' starts the solver at the last solution as it is. 'shift' moves the last
+                           solution and its multipliers forward by one control step, holds the last step and starts
+                           ipopt with NLP.warm_start_options
+        :param deadline: if not None, NLP.solve() runs the solver in a SolverProcess and kills it if it does not
+                         return within deadline seconds. The returned NLPSolution then has the status
+                         'Deadline_Exceeded', and the previous solution is kept for the warm start. The same
+                         solution is returned if the SolverProcess dies, it is restarted for the next solve
+        :param grid: non-uniform time grid of the horizon as (count, length) pairs, with the length in time steps,
+                     e.g. [(8, 1), (8, 4), (6, 16)]. N must equal the sum of count * length. Controls and
+                     disturbances are held within every interval and the forecast is averaged over it. The states
+                     within an interval are no variables of the nlp, the predictors are rolled out over them.
+                     Constraints also apply to the rolled out states, objectives are weighted with the interval
+                     length. A grid requires warm_start='previous'
+        :param qp_solver: if not None and the costs are at most quadratic and the constraints and predictions are
+                          linear in the optimization variables, NLP.build() uses this qpsol plugin (e.g. 'qpoases',
+                          'osqp' or 'qrqp') instead of the nlp solver. Only LinearRegression and linear WhiteBox
+                          predictors qualify. If a qp solve of NLP.solve() fails or violates the bounds, it is
+                          repeated with the nlp solver. This fallback is not available after NLP.load() and in the
+                          SolverProcesses of deadline, submit and multi_start. Note that qrqp has no initial active
+                          set on a cold start and often fails there, it is only reliable when it is warm started
+                          with the active set of the last solution, so qpoases is recommended
+        :param multi_start: number of solves that are run in parallel SolverProcesses from different initial guesses:
+                            the warm start, the cold start, the last controls held over the horizon and random
+                            perturbations of the warm start. The successful solution with the lowest cost is kept
+        :param library: if not None, every successful solution is stored in the SolutionLibrary. Without a valid
+                        warm start, or if a stored parameter vector is within the radius of the library,
+                        the solver starts from the stored solution with the nearest parameter vector
+        """
+
+        assert ordering in ('feature', 'stage'), f'Unknown ordering "{ordering}", please choose feature or stage.'
+        assert map_predictions in (None, 'serial', 'unroll', 'thread'), \
+            f'Unknown map_predictions "{map_predictions}", please choose None, serial, unroll or thread.'
+        assert warm_start in ('previous', 'shift'), f'Unknown warm_start "{warm_start}", please choose previous or shift.'
+        assert backend in ('MX', 'SX'), f'Unknown backend "{backend}", please choose MX or SX.'
+        assert multi_start >= 1, 'Please choose at least one start.'
+        if grid is not None:
+            grid = [(int(count), int(length)) for count, length in grid]
+            assert sum(count * length for count, length in grid) == N, \
+                f'The grid {grid} covers {sum(count * length for count, length in grid)} time steps, but N={N}.'
+            assert control_change_step == 1, 'Please use the grid instead of the control_change_step.'
+            assert map_predictions is None, 'The predictions on a grid are rolled out and can not be mapped.'
+            assert warm_start == 'previous', \
+                'The shift warm start moves by one interval of the grid instead of one time step, ' \
+                'please use warm_start="previous" with a grid.'
 
         self.model: Model = model
         self.objectives: list[Objective] = objectives
@@ -428,14 +665,86 @@ class NLP:
         self._constraints: list[NLPConstraint] = list()
         self._objectives: list[NLPObjective] = list()
 
+        self.parametric_predictors: bool = parametric_predictors
+        self.backend: str = backend
+        self.code_generation: bool = code_generation
+        self.slack_free: bool = slack_free
+        self.ordering: str = ordering
+        self.map_predictions: Optional[str] = map_predictions
+        self.n_threads: int = n_threads
+        self.warm_start: str = warm_start
+        self.deadline: Optional[float] = deadline
+        self.grid: Optional[list[tuple[int, int]]] = grid
+        self.qp_solver: Optional[str] = qp_solver
+        self.multi_start: int = multi_start
+        self.library: Optional[SolutionLibrary] = library
+        self._predictors: list[Predictor] = list()
+        self._pred_pars: dict[Predictor, Union[MX, SX]] = dict()
+
+        # expressions of the predictions of every predictor, used for the statistics
+        self._predictions: dict[Predictor, list[Union[MX, SX]]] = dict()
+
+        self.solver = None
         self.solution: Optional[NLPSolution] = None
 
+        # True if the built problem is solved as quadratic program
+        self.is_qp: bool = False
+
+        # nlp solver that repeats failed qp solves, created on the first failure, and its plugin and options
+        self._fallback_solver: Optional[Function] = None
+        self._fallback_options: Optional[tuple[str, dict]] = None
+
+        self._lbg: np.ndarray = np.ndarray(shape=(0,))
+        self._ubg: np.ndarray = np.ndarray(shape=(0,))
+        self._lbx: np.ndarray = np.ndarray(shape=(0,))
+        self._ubx: np.ndarray = np.ndarray(shape=(0,))
+
+        # indices of the variables and constraints one control step later and the multipliers of the last solution
+        self._shift_x: np.ndarray = np.ndarray(shape=(0,), dtype=int)
+        self._shift_g: np.ndarray = np.ndarray(shape=(0,), dtype=int)
+        self._lam_x: Optional[np.ndarray] = None
+        self._lam_g: Optional[np.ndarray] = None
+
+        # subprocess for NLP.submit() and the par vals, x0 and start time of the solve that is running in it
+        self._worker: Optional[SolverProcess] = None
+        self._pending: Optional[tuple[list[float], np.ndarray, float]] = None
+
+        # subprocesses for the multi start and the generator of its random initial guesses
+        self._pool: list[SolverProcess] = list()
+        self._rng: np.random.Generator = np.random.default_rng()
+
+        # True if the current solve starts from a solution of the library
+        self._library_start: bool = False
+
+        # symbolic x, p, f and g of the built nlp
+        self._problem: Optional[dict] = None
+
+        # (col_name, from past, feature, indices, k and interval length of the par vars) for every column
+        self._gather_plan: list[tuple[str, bool, Feature, np.ndarray, np.ndarray, np.ndarray]] = list()
+
+        # index map from (col_name, k) to the values of a solution
+        self._layout: Optional[SolutionLayout] = None
+
+        # symbols and expressions of the sources, owned by this nlp and replaced on every build
+        self.registry: SymbolRegistry = SymbolRegistry(symbolic=SX if backend == 'SX' else MX)
+
+        # size, sparsity, graph size, build times and memory of the last build, see NLP.build()
+        self.statistics: dict[str, float] = dict()
+
         self.model: Model = model
         self.max_lag: Optional[int] = None
         self.N: int = N
         assert N % control_change_step == 0, "NLP Horizon N must be a multiple of control change step!"
         self.control_change_step = control_change_step
 
+        # start and length of every interval of the horizon
+        self._intervals: dict[int, int] = dict()
+        start = 0
+        for count, length in grid if grid is not None else [(N, 1)]:
+            for _ in range(count):
+                self._intervals[start] = length
+                start += length
+
         self.lastSolutionFailed = True
 
     def _map_indices(self, *predictors: Predictor):
@@ -474,6 +783,24 @@ class NLP:
 
         return (source, k) in self._var_map.keys()
 
+    def on_grid(self, k: int) -> bool:
+        """ returns True if k is in the past, starts an interval of the grid or is the end of the horizon """
+
+        return k <= 0 or k == self.N or k in self._intervals
+
+    def _interval_start(self, k: int) -> int:
+        """ returns the first time step of the interval that contains k """
+
+        return max(start for start in self._intervals if start <= k)
+
+    def _weight(self, k: int) -> int:
+        """ length of the interval that starts at k, the end of the horizon is weighted like the last interval """
+
+        if k == self.N:
+            return self._intervals[self._interval_start(k - 1)] if self.N > 0 else 1
+
+        return self._intervals.get(k, 1)
+
     def _add_variables(self):
 
         for x in self.model.controlled:
@@ -482,7 +809,10 @@ class NLP:
                 self._add_par_var(NLPValue(feature=x, k=k))
 
             for k in range(1, self.N + 1):
-                self._add_opt_var(NLPValue(feature=x, k=k))
+                if self.on_grid(k):
+                    self._add_opt_var(NLPValue(feature=x, k=k))
+                else:
+                    self._var_map[x.source, k] = NLPValue(feature=x, k=k)
 
         for u in self.model.controls:
 
@@ -490,8 +820,12 @@ class NLP:
                 self._add_par_var(NLPValue(feature=u, k=k))
 
             for k in range(0, self.N + 1):
-                if k % self.control_change_step == 0:
-                    self._add_opt_var(NLPValue(feature=u, k=k))
+                if k % self.control_change_step == 0 and self.on_grid(k):
+                    nlp_value = NLPValue(feature=u, k=k)
+                    nlp_value.lb, nlp_value.ub = u.lb, u.ub
+                    self._add_opt_var(nlp_value)
+                elif self.grid is not None:
+                    self._hold(u, k)
                 else:
                     u.source.mx[k] = u.source.mx[k - (k % self.control_change_step)]
                     self._var_map[u.source, k] = self._var_map[u.source, k - (k % self.control_change_step)]
@@ -499,7 +833,10 @@ class NLP:
         for d in self.model.disturbances:
 
             for k in range(-self.idx_map[d.source], self.N + 1):
-                self._add_par_var(NLPValue(feature=d, k=k))
+                if self.on_grid(k):
+                    self._add_par_var(NLPValue(feature=d, k=k))
+                else:
+                    self._hold(d, k)
 
         for c in self.model.connecting:
 
@@ -509,7 +846,17 @@ class NLP:
                 self._add_par_var(NLPValue(feature=c, k=k))
 
             for k in range(0, self.N + 1):
-                self._add_opt_var(NLPValue(feature=c, k=k))
+                if self.on_grid(k):
+                    self._add_opt_var(NLPValue(feature=c, k=k))
+                else:
+                    self._var_map[c.source, k] = NLPValue(feature=c, k=k)
+
+    def _hold(self, feature: Feature, k: int):
+        """ uses the variable of the first time step of the interval for the time step k within the interval """
+
+        start = self._interval_start(k)
+        feature.source.mx[k] = feature.source[start]
+        self._var_map[feature.source, k] = self._var_map[feature.source, start]
 
     def _add_par_var(self, par_var: NLPVariable):
 
@@ -532,8 +879,12 @@ class NLP:
                 if isinstance(c.source, Controlled):
                     continue
 
+                # on a grid, they are connected while the predictions are rolled out, see NLP._roll_out()
+                if self.grid is not None and k > 0:
+                    continue
+
                 self._constraints.append(
-                    NLPConstraint(expression=c.source.constraint(k))
+                    NLPConstraint(expression=c.source.constraint(k), k=k, origin=str(c))
                 )
 
     def _add_predictions(self, *predictors: Predictor):
@@ -542,6 +893,11 @@ class NLP:
 
             self._inp_map[predictor] = dict()
 
+            # the trained parameters of the predictor become parameters of the nlp
+            if self.parametric_predictors and predictor.parameters() is not None:
+                self._pred_pars[predictor] = self.registry.symbolic.sym(
+                    f'Parameters({predictor})', predictor.parameters().size)
+
             for k in range(1, self.N + 1):
 
                 # get the inputs for the predictor
@@ -561,7 +917,16 @@ class NLP:
                 # input vars for Extrapolation Detector
                 self._inp_map[predictor][k] = input_list
 
-                prediction = predictor.predict([inp.mx for inp in input_list])[0]
+            # on a grid, the predictions of all predictors are rolled out together, see NLP._roll_out()
+            if self.grid is not None:
+                continue
+
+            if self.map_predictions is None:
+                predictions = [self._predict(predictor, k) for k in range(1, self.N + 1)]
+            else:
+                predictions = self._map(predictor)
+
+            for k, prediction in zip(range(1, self.N + 1), predictions):
 
                 # access the output mx through the get_var() method to get the correct mx
                 output_mx = self._var_map[predictor.output.source, k].mx
@@ -572,11 +937,136 @@ class NLP:
                         expression=output_mx - prediction,
                         lb=0,
                         ub=0,
+                        k=k,
+                        origin=str(predictor),
+                    )
+                )
+
+        if self.grid is not None:
+            self._roll_out(*predictors)
+
+    def _roll_out(self, *predictors: Predictor):
+        """
+        Predicts the horizon time step by time step. Within an interval of the grid, the states and connecting
+        features are no variables, they are replaced by the expression of their prediction.
+        """
+
+        eliminated = [x.source for x in self.model.controlled] + [c.source for c in self.model.connecting]
+
+        for k in range(1, self.N + 1):
+
+            assigned = set()
+            for predictor in predictors:
+
+                prediction = self._predict(predictor, k)
+
+                if not self.on_grid(k):
+                    predictor.output.source.mx[k] = prediction
+                    assigned.add(predictor.output.source)
+                    continue
+
+                output_mx = self._var_map[predictor.output.source, k].mx
+
+                self._constraints.append(
+                    NLPConstraint(
+                        expression=output_mx - prediction,
+                        lb=0,
+                        ub=0,
+                        k=k,
+                        origin=str(predictor),
                     )
                 )
 
+            if not self.on_grid(k):
+                self._solve_connecting(k, [source for source in eliminated if source not in assigned])
+                continue
+
+            for c in self.model.connecting:
+                self._constraints.append(
+                    NLPConstraint(expression=c.source.constraint(k), k=k, origin=str(c))
+                )
+
+    def _solve_connecting(self, k: int, unknown: list[Source]):
+        """
+        Solves the constraints of the connecting features at the time step k within an interval for the sources
+        that are not predicted, e.g. T[k] = T[k-1] + Change(T)[k] if Change(T) is predicted
+        """
+
+        # the unknown sources are represented by their symbol until they are solved
+        symbols = {source: source[k] for source in unknown}
+
+        remaining = [c.source for c in self.model.connecting]
+        while remaining:
+
+            solved = False
+            for source in list(remaining):
+
+                g = source.constraint(k)
+                unknowns = [s for s in symbols if casadi.depends_on(g, symbols[s])]
+
+                if len(unknowns) > 1:
+                    continue
+
+                remaining.remove(source)
+                solved = True
+
+                if len(unknowns) == 0:
+                    continue
+
+                x = symbols.pop(unknowns[0])
+                assert casadi.is_linear(g, x), f'{source} must be linear in {unknowns[0]} to solve it within an interval.'
+
+                # g is linear in x, so x = -g(x=0) / dg/dx
+                unknowns[0].mx[k] = -substitute(g, x, self.registry.symbolic.zeros(x.shape)) / casadi.jacobian(g, x)
+
+            if not solved:
+                raise ValueError(f'The connecting features {remaining} can not be solved at k={k} within an '
+                                 f'interval of the grid, as more than one of their sources is unknown.')
+
+        if symbols:
+            raise ValueError(f'{list(symbols)} are neither predicted nor connected at k={k} within an interval of '
+                             f'the grid.')
+
+    def _predict(self, predictor: Predictor, k: int) -> Union[MX, SX]:
+        """ inlines the prediction of the given predictor at time step k """
+
+        inputs = [inp.mx for inp in self._inp_map[predictor][k]]
+
+        if predictor in self._pred_pars:
+            prediction = predictor.parametric_predict(inputs, self._pred_pars[predictor])[0]
+        else:
+            prediction = predictor.predict(inputs)[0]
+
+        self._predictions.setdefault(predictor, list()).append(prediction)
+
+        return prediction
+
+    def _map(self, predictor: Predictor) -> list[Union[MX, SX]]:
+        """ evaluates the casadi Function of the given predictor for all time steps at once """
+
+        # one column with the inputs for every time step
+        inputs = horzcat(*[vertcat(*[inp.mx for inp in self._inp_map[predictor][k]]) for k in range(1, self.N + 1)])
+
+        function = predictor.casadi_function(parametric=predictor in self._pred_pars)
+
+        if self.map_predictions == 'thread':
+            mapped = function.map(self.N, self.map_predictions, self.n_threads)
+        else:
+            mapped = function.map(self.N, self.map_predictions)
+
+        if predictor in self._pred_pars:
+            predictions = mapped(inputs, repmat(self._pred_pars[predictor], 1, self.N))
+        else:
+            predictions = mapped(inputs)
+
+        self._predictions.setdefault(predictor, list()).append(predictions)
+
+        return horzsplit(predictions)
+
     def _add_constraints(self, *constraints: Constraint):
 
+        opt_vars = {id(opt_var) for opt_var in self._opt_vars}
+
         for constraint in constraints:
 
             for k in range(-self.max_lag, self.N + 1):
@@ -585,6 +1075,19 @@ class NLP:
                 if not self.is_variable(constraint.feature.source, k):
                     continue
 
+                nlp_var = self._var_map[constraint.feature.source, k]
+
+                # within an interval of the grid, held variables are already constrained at the start of the interval,
+                # the eliminated states are constrained by their rolled out expression
+                if not self.on_grid(k) and nlp_var is self._var_map[constraint.feature.source, self._interval_start(k)]:
+                    continue
+
+                # constraints on a single optimization variable are passed to the solver as simple bounds
+                if id(nlp_var) in opt_vars:
+                    nlp_var.lb = max(nlp_var.lb, constraint.lb)
+                    nlp_var.ub = min(nlp_var.ub, constraint.ub)
+                    continue
+
                 self._constraints.append(
                     constraint.get(k)
                 )
@@ -599,11 +1102,15 @@ class NLP:
             for k in range(0, self.N + 1):
 
                 # check if the variable exists for the given k otherwise continue
-                if not self.is_variable(objective.feature.source, k):
+                if not self.is_variable(objective.feature.source, k) or not self.on_grid(k):
                     continue
 
+                n_objectives = len(self._objectives)
+
                 nlp_value = self._var_map[objective.feature.source, k]
                 feature = objective.feature
+                slack_free = self.slack_free if objective.slack_free is None else objective.slack_free
+                origin = str(objective)
 
                 if isinstance(feature, Controlled):
 
@@ -618,19 +1125,15 @@ class NLP:
                         self._par_vars.extend((lb, ub))
 
                         self._constraints.append(
-                            NLPConstraint(nlp_value.mx - lb.mx + lb_eps.mx, 0, inf)
+                            NLPConstraint(nlp_value.mx - lb.mx + lb_eps.mx, 0, inf, k, origin)
                         )
                         self._constraints.append(
-                            NLPConstraint(nlp_value.mx - ub.mx - ub_eps.mx, -inf, 0)
+                            NLPConstraint(nlp_value.mx - ub.mx - ub_eps.mx, -inf, 0, k, origin)
                         )
 
                         # eps > 0
-                        self._constraints.append(
-                            NLPConstraint(expression=lb_eps.mx, lb=0, ub=inf)
-                        )
-                        self._constraints.append(
-                            NLPConstraint(expression=ub_eps.mx, lb=0, ub=inf)
-                        )
+                        lb_eps.lb = 0
+                        ub_eps.lb = 0
 
                         # objective
                         self._objectives.append(
@@ -640,6 +1143,16 @@ class NLP:
                             NLPObjective(objective(ub_eps.mx))
                         )
 
+                    elif isinstance(feature.mode, Steady) and slack_free and objective.cost.even:
+
+                        target = NLPTarget(feature=feature, k=k)
+                        self._par_vars.append(target)
+
+                        # an even cost of the deviation equals the cost of both slacks
+                        self._objectives.append(
+                            NLPObjective(objective(nlp_value.mx - target.mx))
+                        )
+
                     elif isinstance(feature.mode, Steady):
 
                         eps1 = NLPEpsilon(feature=feature, k=k)
@@ -651,19 +1164,15 @@ class NLP:
                         self._par_vars.append(target)
 
                         self._constraints.append(
-                            NLPConstraint(nlp_value.mx - target.mx + eps1.mx, 0, inf)
+                            NLPConstraint(nlp_value.mx - target.mx + eps1.mx, 0, inf, k, origin)
                         )
                         self._constraints.append(
-                            NLPConstraint(nlp_value.mx - target.mx - eps2.mx, -inf, 0)
+                            NLPConstraint(nlp_value.mx - target.mx - eps2.mx, -inf, 0, k, origin)
                         )
 
                         # eps > 0
-                        self._constraints.append(
-                            NLPConstraint(expression=eps1.mx, lb=0, ub=inf)
-                        )
-                        self._constraints.append(
-                            NLPConstraint(expression=eps2.mx, lb=0, ub=inf)
-                        )
+                        eps1.lb = 0
+                        eps2.lb = 0
 
                         # objective
                         self._objectives.append(
@@ -685,16 +1194,11 @@ class NLP:
 
                     # t1 - t2 = x
                     self._constraints.append(
-                        NLPConstraint(expression=eps1.mx - eps2.mx - nlp_value.mx, lb=0, ub=0)
-                    )
-                    # eps1 > 0
-                    self._constraints.append(
-                        NLPConstraint(expression=eps1.mx, lb=0, ub=inf)
-                    )
-                    # eps2 > 0
-                    self._constraints.append(
-                        NLPConstraint(expression=eps2.mx, lb=0, ub=inf)
+                        NLPConstraint(expression=eps1.mx - eps2.mx - nlp_value.mx, lb=0, ub=0, k=k, origin=origin)
                     )
+                    # eps1 > 0, eps2 > 0
+                    eps1.lb = 0
+                    eps2.lb = 0
 
                     self._objectives.append(
                         NLPObjective(objective(eps1.mx))
@@ -704,16 +1208,26 @@ class NLP:
                         NLPObjective(objective(eps2.mx))
                     )
 
+                elif slack_free:
+
+                    self._objectives.append(NLPObjective(objective(nlp_value.mx)))
+
                 else:
                     eps = NLPEpsilon(feature=feature, k=k)
                     self._opt_vars.append(eps)
 
                     self._constraints.append(
-                        NLPConstraint(expression=eps.mx - nlp_value.mx, lb=0, ub=0)
+                        NLPConstraint(expression=eps.mx - nlp_value.mx, lb=0, ub=0, k=k, origin=origin)
                     )
 
                     self._objectives.append(NLPObjective(objective(eps.mx)))
 
+                # on a grid, every time step stands for the interval that starts at it
+                weight = self._weight(k)
+                if weight != 1:
+                    for nlp_objective in self._objectives[n_objectives:]:
+                        nlp_objective.expression = weight * nlp_objective.expression
+
     def _get_coldstart(self):
 
         cold_start_values: list = list()
@@ -768,7 +1282,31 @@ class NLP:
             print('   ', objective)
         print()
 
+        # the nonzeros are only calculated on demand if the solver does not provide them
+        if self._problem is not None and not {'jacobian_nonzeros', 'hessian_nonzeros'} <= self.statistics.keys():
+            self.statistics.update(self._derivative_statistics())
+
+        print('Statistics:')
+        for key, value in self.statistics.items():
+            print('   ', f'{key}:', value)
+        print()
+
     def build(self, predictors: list[Predictor], alg: str = 'ipopt', solver_options: Optional[dict] = None):
+        """
+        Builds the nlp and its solver. NLP.statistics records the number of variables and constraints,
+        the nonzeros of the constraint jacobian and the hessian of the lagrangian if the solver provides them,
+        the nodes of the expression graph of the predictions of every predictor, the time of every build phase
+        and the peak resident memory of the process. See NLP.trace_memory for the python allocations.
+        """
+
+        build_start = time.perf_counter()
+        timings: dict[str, float] = dict()
+        rss_before = _peak_rss()
+
+        # a trace that was started by the caller is left alone
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
 
         self.max_lag: int = max([0] + [p.inputs.maxLag for p in predictors])
 
@@ -780,22 +1318,79 @@ class NLP:
         self._constraints: list[NLPConstraint] = list()
         self._objectives: list[NLPObjective] = list()
 
-        self._map_indices(*predictors)
+        self._predictors: list[Predictor] = list(predictors)
+        self._pred_pars: dict[Predictor, Union[MX, SX]] = dict()
+        self._predictions: dict[Predictor, list[Union[MX, SX]]] = dict()
+        self._build_options: tuple[str, Optional[dict]] = (alg, solver_options)
+
+        # the symbols of a previous build are released, the new ones are created with the symbolic type of the backend
+        self.registry.clear(symbolic=SX if self.backend == 'SX' else MX)
+
+        with self.registry.activate():
+            self._build(predictors, alg, solver_options, timings)
+
+        timings['time_build'] = time.perf_counter() - build_start
+
+        memory = {'peak_rss': _peak_rss()}
+        memory['build_rss'] = memory['peak_rss'] - rss_before
 
-        self._add_variables()
-        self._connect_constructed()
-        self._add_predictions(*predictors)
-        self._add_constraints(*self.constraints)
-        self._add_objectives(*self.objectives)
+        if tracing:
+            memory['peak_python_memory'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        self.statistics = {**self._size_statistics(), **timings, **memory}
+
+    def _build(self, predictors: list[Predictor], alg: str, solver_options: Optional[dict], timings: dict[str, float]):
+        """
+        builds the nlp and its solver, the symbols are created in the active SymbolRegistry of the nlp.
+        The time of every phase is written to timings
+        """
+
+        def timed(phase: str, function: Callable, *args):
+            start_time = time.perf_counter()
+            function(*args)
+            timings[f'time_{phase}'] = time.perf_counter() - start_time
+
+        timed('map_indices', self._map_indices, *predictors)
+
+        timed('add_variables', self._add_variables)
+        timed('connect_constructed', self._connect_constructed)
+        timed('add_predictions', self._add_predictions, *predictors)
+        timed('add_constraints', self._add_constraints, *self.constraints)
+        timed('add_objectives', self._add_objectives, *self.objectives)
+
+        start_time = time.perf_counter()
+
+        if self.ordering == 'stage':
+            # stable sort, so the order within every time step is kept
+            self._opt_vars.sort(key=lambda opt_var: opt_var.k)
+            self._constraints.sort(key=lambda constraint: constraint.k)
+
+        self._gather_plan = self._plan_gather()
+        self._layout = SolutionLayout(par_vars=self._par_vars, opt_vars=self._opt_vars, inp_map=self._inp_map)
+
+        self._shift_x = self._shift_indices(
+            [((opt_var.__class__.__name__, opt_var.feature.source.name), opt_var.k) for opt_var in self._opt_vars])
+        self._shift_g = self._shift_indices(
+            [(constraint.origin, constraint.k) for constraint in self._constraints])
 
         if solver_options is None:
             solver_options = dict()
 
+        if self.warm_start == 'shift' and alg == 'ipopt':
+            solver_options = {**self.warm_start_options, **solver_options}
+
         obj = sum([objective.expression for objective in self._objectives])
 
         g = [constraint.expression for constraint in self._constraints]
 
-        par_vars = [par_var.mx for par_var in self._par_vars]
+        # the bounds of the constraints and variables do not change between the calls to the solver
+        self._lbg = np.array([constraint.lb for constraint in self._constraints], dtype=float)
+        self._ubg = np.array([constraint.ub for constraint in self._constraints], dtype=float)
+        self._lbx = np.array([opt_var.lb for opt_var in self._opt_vars], dtype=float)
+        self._ubx = np.array([opt_var.ub for opt_var in self._opt_vars], dtype=float)
+
+        par_vars = [par_var.mx for par_var in self._par_vars] + list(self._pred_pars.values())
         opt_vars = [opt_var.mx for opt_var in self._opt_vars]
 
         nlp = {
@@ -805,51 +1400,753 @@ class NLP:
             'p': vertcat(*par_vars),
         }
 
-        self.solver = nlpsol('solver', alg, nlp, solver_options)
+        self._problem = nlp
+        timings['time_assemble'] = time.perf_counter() - start_time
 
-    def solve(self, par_vals: list[float]) -> NLPSolution:
-        """ solves the nlp and stops the calculation time """
+        start_time = time.perf_counter()
+
+        qp = self._quadratic_program(nlp)
+        self.is_qp = qp is not None
+
+        self._fallback_solver = None
+        self._fallback_options = (alg, solver_options)
+
+        if self.is_qp:
+            print(f'the problem is quadratic, using {self.qp_solver}')
+            self.solver = qpsol('solver', self.qp_solver, qp, self._qp_solver_options(solver_options))
+        elif self.code_generation:
+            self.solver = self._compiled_solver(nlp, alg, solver_options)
+        else:
+            self.solver = nlpsol('solver', alg, nlp, solver_options)
+
+        timings['time_solver'] = time.perf_counter() - start_time
+
+    def _size_statistics(self) -> dict[str, float]:
+        """
+        returns the dimensions of the built nlp, the nonzeros of the constraint jacobian and of the upper triangle
+        of the hessian of the lagrangian from the functions of the solver and the number of nodes of the expression
+        graph of the predictions of every predictor, including the predictions that are rolled out on a grid
+        """
+
+        x, p = self._problem['x'], self._problem['p']
+
+        statistics = {
+            'par_vars':             len(self._par_vars),
+            'opt_vars':             len(self._opt_vars),
+            'constraints':          len(self._constraints),
+            'objectives':           len(self._objectives),
+        }
+
+        # e.g. qp solvers and limited-memory hessian approximations do not provide them, see NLP.summary()
+        for key, name, i in (('jacobian_nonzeros', 'nlp_jac_g', 1), ('hessian_nonzeros', 'nlp_hess_l', 0)):
+            if self.solver.has_function(name):
+                statistics[key] = self.solver.get_function(name).sparsity_out(i).nnz()
+
+        # predictors with the same output have the same name, so they are told apart by their position
+        for i, predictor in enumerate(self._predictors):
+            predictions = vertcat(*self._predictions.get(predictor, []))
+            statistics[f'nodes {i} {predictor}'] = Function('predictions', [x, p], [predictions]).n_nodes()
+
+        return statistics
+
+    def _derivative_statistics(self) -> dict[str, float]:
+        """
+        returns the nonzeros of the constraint jacobian and of the upper triangle of the hessian of the lagrangian
+        calculated from the symbolic problem, which is more expensive than reading them from the solver
+        """
+
+        x, f, g = (self._problem[key] for key in ('x', 'f', 'g'))
+
+        lagrangian = f + dot(type(x).sym('lam_g', g.shape), g)
+
+        return {
+            'jacobian_nonzeros':    jacobian_sparsity(g, x).nnz(),
+            'hessian_nonzeros':     casadi.triu(jacobian_sparsity(gradient(lagrangian, x), x)).nnz(),
+        }
+
+    def _quadratic_program(self, nlp: dict) -> Optional[dict]:
+        """
+        Returns the problem as scalar expressions if its objective is quadratic and its constraints are linear
+        in the optimization variables, otherwise None. The parameters may enter nonlinearly.
+        """
+
+        if self.qp_solver is None:
+            return None
+
+        # checked first, so nonlinear predictors are not expanded to scalar expressions only to find out
+        if not all(predictor.is_linear() for predictor in self._predictors):
+            return None
+
+        function = Function('nlp', [nlp['x'], nlp['p']], [nlp['f'], nlp['g']])
+
+        if function.is_a('MXFunction'):
+            try:
+                function = function.expand()
+            except RuntimeError:
+                # e.g. external functions can not be expanded to scalar expressions
+                return None
+
+        x = SX.sym('x', nlp['x'].shape)
+        p = SX.sym('p', nlp['p'].shape)
+        f, g = function(x, p)
+
+        if not is_quadratic(f, x) or not is_linear(g, x):
+            return None
+
+        return {'x': x, 'p': p, 'f': f, 'g': g}
+
+    def _qp_solver_options(self, solver_options: dict) -> dict:
+        """ returns the defaults of the qp solver updated with the passed options that the qp solver accepts """
+
+        options = {
+            option: value for option, value in solver_options.items()
+            if option in conic_options(self.qp_solver) or option in ('print_time', 'verbose', 'error_on_fail')
+        }
+
+        return {**self.qp_options.get(self.qp_solver, {'error_on_fail': False}), **options}
+
+    def _compiled_solver(self, nlp: dict, alg: str, solver_options: dict) -> Function:
+        """
+        Returns a solver that evaluates the nlp functions from a compiled shared library.
+        The library is named after a hash of the serialized problem and of the options the generated code
+        depends on, so it is only compiled on the first build. The C code is generated in a temporary directory
+        and the library is moved to FileManager.solvers_dir() once it is compiled.
+        """
+
+        # the derivative functions are only generated for the options that affect them
+        options = {option: value for option, value in solver_options.items() if not option.startswith(alg)}
+
+        # the serialized function contains the structure of all expressions, including baked predictor weights
+        structure = Function('nlp', [nlp['x'], nlp['p']], [nlp['f'], nlp['g']]).serialize()
+        key = hashlib.sha256(
+            f'{casadi.__version__}|{alg}|{sorted(options.items())}|{structure}'.encode()).hexdigest()[:16]
+
+        name = f'nlp_{key}'
+        directory = Path(file_manager.solvers_dir())
+        library = directory / f'{name}{".dll" if sys.platform == "win32" else ".so"}'
+
+        if not library.exists():
+
+            print(f'generating and compiling {library.name}')
+            start_time = time.perf_counter()
+
+            solver = nlpsol(name, alg, nlp, options)
+
+            # the same functions as Function.generate_dependencies(), which can only write to the working directory
+            generator = casadi.CodeGenerator(name, {'with_header': False})
+            generator.add(Function('nlp', [nlp['x'], nlp['p']], [nlp['f'], nlp['g']], ['x', 'p'], ['f', 'g']))
+            for function in solver.get_function():
+                generator.add(solver.get_function(function))
+
+            with tempfile.TemporaryDirectory() as temp_dir:
+
+                source = Path(generator.generate(f'{temp_dir}{os.sep}'))
+                compiled = Path(temp_dir) / library.name
+
+                try:
+                    subprocess.run(
+                        [self.compiler, *self.compiler_flags, '-shared', str(source), '-o', str(compiled), '-lm'],
+                        check=True,
+                        capture_output=True,
+                        text=True,
+                    )
+                except subprocess.CalledProcessError as e:
+                    raise RuntimeError(f'Compiling {source.name} failed:\n{e.stderr}')
+
+                # other processes that build the same problem never load a partially written library
+                partial = directory / f'{name}.{os.getpid()}.partial'
+                shutil.copyfile(compiled, partial)
+                os.replace(partial, library)
+
+            print(f'compiled in {time.perf_counter() - start_time:.2f}s')
+
+        return nlpsol('solver', alg, str(library), solver_options)
+
+    def _plan_gather(self) -> list[tuple[str, bool, Feature, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Groups the par vars by their column and by whether they are read from the past (k <= 0) or the forecast,
+        so all values of a column can be gathered at once. The forecast is averaged over the interval length.
+        """
+
+        groups: dict[tuple[str, bool], tuple[Feature, list[int], list[int], list[int]]] = dict()
+        for i, par_var in enumerate(self._par_vars):
+            feature, indices, ks, lengths = groups.setdefault(
+                (par_var.col_name, par_var.k <= 0), (par_var.feature, [], [], []))
+            indices.append(i)
+            ks.append(par_var.k)
+            lengths.append(self._intervals.get(par_var.k, 1) if 0 < par_var.k < self.N else 1)
+
+        return [
+            (col_name, past, feature, np.array(indices, dtype=int), np.array(ks, dtype=int),
+             np.array(lengths, dtype=int))
+            for (col_name, past), (feature, indices, ks, lengths) in groups.items()
+        ]
+
+    def _shift_indices(self, elements: list[tuple[Union[tuple, str], int]]) -> np.ndarray:
+        """
+        Takes a (group, k) pair for every variable or constraint and returns the index of the element
+        of the same group one control step later. The last element of every group is held.
+        """
+
+        # elements with the same group and k, e.g. the two slacks of an objective, are told apart by their count
+        count = dict()
+        keyed = list()
+        for group, k in elements:
+            n = count.get((group, k), 0)
+            count[group, k] = n + 1
+            keyed.append(((group, n), k))
+
+        groups: dict[tuple, dict[int, int]] = dict()
+        for i, (group, k) in enumerate(keyed):
+            groups.setdefault(group, dict())[k] = i
+
+        indices = list()
+        for group, k in keyed:
+            later = [j for j in groups[group] if j >= k + self.control_change_step]
+            indices.append(groups[group][min(later) if later else max(groups[group])])
+
+        return np.array(indices, dtype=int)
+
+    def bandwidth(self) -> dict[str, Optional[int]]:
+        """ returns the bandwidth max(|i - j|) of the constraint jacobian and of the hessian of the lagrangian """
 
         assert self.solver is not None, 'Please make sure to call NLP.build() first.'
 
-        lbg = [constraint.lb for constraint in self._constraints]
-        ubg = [constraint.ub for constraint in self._constraints]
+        def bandwidth(name: str) -> Optional[int]:
+
+            # e.g. no hessian is created for limited-memory hessian approximations
+            if not self.solver.has_function(name):
+                return None
+
+            rows, cols = self.solver.get_function(name).sparsity_out(1 if name == 'nlp_jac_g' else 0).get_triplet()
+
+            return int(max([0] + [abs(i - j) for i, j in zip(rows, cols)]))
+
+        return {
+            'jacobian': bandwidth('nlp_jac_g'),
+            'hessian':  bandwidth('nlp_hess_l'),
+        }
+
+    def save(self, filename: str, override: bool = False):
+        """
+        Saves the built solver together with the layout of the variables and constraints to the disc.
+        path: [FileManager.base]/solvers/[filename].pkl
+        """
+
+        assert self.solver is not None, 'Please make sure to call NLP.build() before saving.'
+
+        # every variable is identified by its type, the name of its source and k
+        def layout(nlp_vars: list[NLPVariable]) -> list[tuple[str, str, int]]:
+            return [(var.__class__.__name__, var.feature.source.name, var.k) for var in nlp_vars]
+
+        # references to the variables are stored as position in the par or opt vars
+        position = {id(var): ('par', i) for i, var in enumerate(self._par_vars)}
+        position.update({id(var): ('opt', i) for i, var in enumerate(self._opt_vars)})
+
+        # the states within an interval of the grid are no variables of the nlp
+        for var in self._var_map.values():
+            position.setdefault(id(var), ('eliminated', (var.feature.source.name, var.k)))
+
+        data = {
+            'solver':                   self.solver.serialize(),
+            'is_qp':                    self.is_qp,
+            'statistics':               self.statistics,
+            'build_options':            self._build_options,
+            'N':                        self.N,
+            'control_change_step':      self.control_change_step,
+            'grid':                     self.grid,
+            'backend':                  self.backend,
+            'max_lag':                  self.max_lag,
+            'par_vars':                 layout(self._par_vars),
+            'opt_vars':                 layout(self._opt_vars),
+            'var_map':                  [(source.name, k, *position[id(var)])
+                                         for (source, k), var in self._var_map.items()],
+            'inp_map':                  [{k: [position[id(var)] for var in inputs] for k, inputs in inp_map.items()}
+                                         for inp_map in self._inp_map.values()],
+            'pred_pars':                [self._pred_pars[predictor].numel() if predictor in self._pred_pars else None
+                                         for predictor in self._predictors],
+            'lbg':                      self._lbg,
+            'ubg':                      self._ubg,
+            'lbx':                      self._lbx,
+            'ubx':                      self._ubx,
+            'shift_x':                  self._shift_x,
+            'shift_g':                  self._shift_g,
+        }
+
+        write_pkl(data, filename, file_manager.solvers_dir(), override)
+
+    def load(self, filename: str, predictors: list[Predictor]):
+        """
+        Restores a solver that was saved with NLP.save() instead of calling NLP.build().
+        The NLP must be created with the same model, horizon and control change step as the saved one.
+        The predictors are only required to pass their current parameters to parametric solvers.
+        """
+
+        data = read_pkl(filename, file_manager.solvers_dir())
+
+        assert isinstance(data, dict) and 'solver' in data, \
+            f'Wrong type loaded. File at {file_manager.solvers_dir()}//{filename} is not a saved NLP.'
+        assert data['N'] == self.N and data['control_change_step'] == self.control_change_step, \
+            f'The saved NLP was built with N={data["N"]} and control_change_step={data["control_change_step"]}.'
+        assert data.get('grid') == self.grid, f'The saved NLP was built with the grid {data.get("grid")}.'
+        assert len(data['inp_map']) == len(predictors), \
+            f'The saved NLP was built with {len(data["inp_map"])} predictors, got {len(predictors)}.'
+
+        self.registry.clear(symbolic=SX if data['backend'] == 'SX' else MX)
+
+        features = {feature.source.name: feature for feature in self.model.features}
+        types = {t.__name__: t for t in (NLPValue, NLPTarget, NLPLowerBound, NLPUpperBound, NLPEpsilon)}
+
+        def restore(nlp_vars: list[tuple[str, str, int]]) -> list[NLPVariable]:
+
+            restored = list()
+            for name, source, k in nlp_vars:
+                assert source in features, f'{source} of the saved NLP is not part of the Model.'
+                restored.append(types[name](feature=features[source], k=k))
+
+            return restored
+
+        def resolve(group: str, i: Union[int, tuple[str, int]]) -> NLPVariable:
+            if group == 'eliminated':
+                return NLPValue(feature=features[i[0]], k=i[1])
+            return nlp_vars[group][i]
+
+        with self.registry.activate():
+            self._par_vars = restore(data['par_vars'])
+            self._opt_vars = restore(data['opt_vars'])
+            nlp_vars = {'par': self._par_vars, 'opt': self._opt_vars}
+
+            self._var_map = {
+                (features[source].source, k): resolve(group, i) for source, k, group, i in data['var_map']
+            }
+            self._inp_map = {
+                predictor: {k: [resolve(group, i) for group, i in inputs] for k, inputs in inp_map.items()}
+                for predictor, inp_map in zip(predictors, data['inp_map'])
+            }
+
+        # the parameter symbols are only required for their size
+        self._predictors = list(predictors)
+        self._pred_pars = {
+            predictor: self.registry.symbolic.sym(f'Parameters({predictor})', size)
+            for predictor, size in zip(predictors, data['pred_pars']) if size is not None
+        }
+
+        self._constraints = list()
+        self._objectives = list()
+        self._lbg = data['lbg']
+        self._ubg = data['ubg']
+        self._lbx = data['lbx']
+        self._ubx = data['ubx']
+        self._shift_x = data['shift_x']
+        self._shift_g = data['shift_g']
+        self._gather_plan = self._plan_gather()
+        self._layout = SolutionLayout(par_vars=self._par_vars, opt_vars=self._opt_vars, inp_map=self._inp_map)
+
+        self._problem = None
+
+        self.backend = data['backend']
+        self.max_lag = data['max_lag']
+        self._build_options = data['build_options']
+        self.solver = Function.deserialize(data['solver'])
+        self.is_qp = data.get('is_qp', False)
+        self.statistics = data.get('statistics', dict())
+
+        self.solution = None
+        self.lastSolutionFailed = True
+
+    def update_predictors(self, predictors: list[Predictor]):
+        """
+        Passes retrained predictors to a built NLP.
+        With parametric_predictors=True only the parameter values are swapped. The NLP is only rebuilt if the
+        parameters are not parametric or if their number changed, e.g. a GaussianProcess with more training samples.
+        """
+
+        assert self.solver is not None, 'Please make sure to call NLP.build() first.'
+        assert len(predictors) == len(self._predictors), 'The number of predictors must not change.'
+
+        pred_pars = dict()
+        for old, new in zip(self._predictors, predictors):
+
+            if old not in self._pred_pars:
+
+                # predictors that are built into the nlp must stay the same
+                if new is not old or new.parameters() is not None:
+                    break
+
+                continue
+
+            if new.parameters() is None or new.parameters().size != self._pred_pars[old].numel():
+                break
+
+            pred_pars[new] = self._pred_pars[old]
+
+        else:
+            self._inp_map = {new: self._inp_map[old] for old, new in zip(self._predictors, predictors)}
+            self._pred_pars = pred_pars
+            self._predictors = list(predictors)
+
+            return
+
+        alg, solver_options = self._build_options
+        self.build(predictors=predictors, alg=alg, solver_options=solver_options)
+
+    def _predictor_values(self) -> list[np.ndarray]:
+        """ returns the current parameter values of all parametric predictors """
+
+        values = list()
+        for predictor, mx in self._pred_pars.items():
+
+            value = predictor.parameters()
+            if value.size != mx.numel():
+                raise ValueError(f'The number of parameters of {predictor} changed from {mx.numel()} to '
+                                 f'{value.size}. Please call NLP.update_predictors() or NLP.build() again.')
+
+            values.append(value)
+
+        return values
+
+    def _parameter_vector(self, par_vals: list[float]) -> np.ndarray:
+        """ returns the values of the par vars followed by the parameters of the parametric predictors """
+
+        return np.concatenate([np.array(par_vals, dtype=float), *self._predictor_values()])
+
+    def _instance(self, par_vals: list[float]) -> dict:
+        """ returns the numerical values passed to the solver, including the warm start """
 
         nlp_instance = {
-            'lbg': vertcat(*lbg),
-            'ubg': vertcat(*ubg),
-            'p': vertcat(*par_vals),
+            'lbg': self._lbg,
+            'ubg': self._ubg,
+            'lbx': self._lbx,
+            'ubx': self._ubx,
+            'p': self._parameter_vector(par_vals),
         }
 
         # warm start if a solution is available
         if self.solution is not None and self.lastSolutionFailed is False:
-            nlp_instance['x0'] = self.solution.opt_vals
+
+            if self.warm_start == 'shift':
+                nlp_instance['x0'] = self.solution.opt_vals[self._shift_x]
+                nlp_instance['lam_x0'] = self._lam_x[self._shift_x]
+                nlp_instance['lam_g0'] = self._lam_g[self._shift_g]
+            else:
+                nlp_instance['x0'] = self.solution.opt_vals
+
+                # the active set solvers start from the active set of the last solution
+                if self.is_qp:
+                    nlp_instance['lam_x0'] = self._lam_x
+                    nlp_instance['lam_g0'] = self._lam_g
+
         else:
             nlp_instance['x0'] = self._get_coldstart()
 
-        # call to the solver
-        print('start solving')
-        start_time = time.perf_counter()
-        result = self.solver(**nlp_instance)
-        stop_time = time.perf_counter()
-        print('return_status:   ', self.solver.stats()['return_status'])
-        print('success:         ', self.solver.stats()['success'])
+        self._library_start = False
+
+        if self.library is not None:
+
+            # without a valid warm start the nearest solution is used, otherwise only a solution within the radius
+            valid = self.solution is not None and self.lastSolutionFailed is False and self.solution.success
+            match = self.library.nearest(nlp_instance['p'], radius=self.library.radius if valid else np.inf)
+
+            if match is not None:
+                nlp_instance['x0'], lam_x, lam_g = match
+
+                if self.warm_start == 'shift' or self.is_qp:
+                    nlp_instance['lam_x0'] = lam_x
+                    nlp_instance['lam_g0'] = lam_g
+
+                self._library_start = True
+
+        return nlp_instance
+
+    def _solution(self, par_vals: list[float], result: dict, stats: dict, runtime: float) -> NLPSolution:
+        """ stores the result of the solver as new solution """
+
+        opt_vals = np.array(result['x'], dtype=float).flatten()
+
+        if self.is_qp and not stats.get('qp_fallback', False):
+            opt_vals, stats = self._check_qp_bounds(opt_vals, stats)
+
+        print('return_status:   ', stats['return_status'])
+        print('success:         ', stats['success'])
         print('finished solving')
 
-        if self.solver.stats()['return_status'] == 'Invalid_Number_Detected':
+        if stats['return_status'] == 'Invalid_Number_Detected':
             self.lastSolutionFailed = True
         else:
             self.lastSolutionFailed = False
 
+        self._lam_x = np.array(result['lam_x'], dtype=float).flatten()
+        self._lam_g = np.array(result['lam_g'], dtype=float).flatten()
+
         self.solution = NLPSolution(
-            par_vars=self._par_vars,
-            opt_vars=self._opt_vars,
+            layout=self._layout,
             par_vals=par_vals,
-            opt_vals=[float(val) for val in result['x'].toarray()],
-            inp_map=self._inp_map,
-            runtime=stop_time - start_time,
-            success=self.solver.stats()['success'],
-            status=self.solver.stats()['return_status'],
+            opt_vals=opt_vals,
+            runtime=runtime,
+            success=stats['success'],
+            status=stats['return_status'],
+            stats=stats,
         )
 
+        if self.library is not None:
+
+            if stats['success']:
+                self.library.add(self._parameter_vector(par_vals), self.solution.opt_vals, self._lam_x, self._lam_g)
+
+            if stats.get('iter_count', -1) >= 0:
+                self.library.record(stats['iter_count'], from_library=self._library_start)
+
         return self.solution
+
+    def _check_qp_bounds(self, opt_vals: np.ndarray, stats: dict) -> tuple[np.ndarray, dict]:
+        """
+        marks a successful qp solution as failed if it violates the variable bounds, e.g. osqp with loose tolerances
+        or qrqp from a cold start, and returns the values clipped to the bounds
+        """
+
+        if not stats['success']:
+            return opt_vals, stats
+
+        violation = np.max(np.concatenate([[0], self._lbx - opt_vals, opt_vals - self._ubx]))
+
+        if violation > self.qp_bound_tolerance:
+            stats = {**stats, 'success': False, 'return_status': f'Bounds_Violated ({violation:.2e})'}
+
+        return np.clip(opt_vals, self._lbx, self._ubx), stats
+
+    def _solve_qp_fallback(self, nlp_instance: dict, result: dict, stats: dict) -> tuple[dict, dict]:
+        """ repeats a failed qp solve with the nlp solver, which is built on the first failure """
+
+        _, stats = self._check_qp_bounds(np.array(result['x'], dtype=float).flatten(), stats)
+
+        # a loaded nlp has no symbolic problem to build the nlp solver from
+        if stats['success'] or self._problem is None:
+            return result, stats
+
+        print(f'{self.qp_solver} failed ({stats["return_status"]}), solving with the nlp solver')
+
+        if self._fallback_solver is None:
+            alg, solver_options = self._fallback_options
+            self._fallback_solver = nlpsol('fallback', alg, self._problem, solver_options)
+
+        result = self._fallback_solver(**nlp_instance)
+
+        return result, {**self._fallback_solver.stats(), 'qp_fallback': True}
+
+    def solve(self, par_vals: list[float]) -> NLPSolution:
+        """ solves the nlp and stops the calculation time """
+
+        assert self.solver is not None, 'Please make sure to call NLP.build() first.'
+
+        if self.multi_start > 1:
+            return self._solve_multi_start(par_vals)
+
+        if self.deadline is not None:
+            return self._solve_with_deadline(par_vals)
+
+        nlp_instance = self._instance(par_vals)
+
+        # call to the solver
+        print('start solving')
+        start_time = time.perf_counter()
+        result = self.solver(**nlp_instance)
+        stats = self.solver.stats()
+
+        if self.is_qp:
+            result, stats = self._solve_qp_fallback(nlp_instance, result, stats)
+
+        stop_time = time.perf_counter()
+
+        return self._solution(par_vals, result, stats, stop_time - start_time)
+
+    def _solve_with_deadline(self, par_vals: list[float]) -> NLPSolution:
+        """ solves the nlp in the SolverProcess and restarts the process if the deadline is exceeded """
+
+        x0 = None
+
+        try:
+            self.submit(par_vals)
+            _, x0, _ = self._pending
+            solution = self.collect(timeout=self.deadline)
+
+        except (RuntimeError, BrokenPipeError, EOFError) as e:
+            # the SolverProcess died and was restarted, the previous solution is kept like for a missed deadline
+            print(f'solving in the SolverProcess failed: {e}')
+            self._pending = None
+            return self._deadline_exceeded(par_vals, x0 if x0 is not None else self._get_coldstart())
+
+        if solution is not None:
+            return solution
+
+        # the solver can not be interrupted, so the process is killed and started again
+        print(f'deadline of {self.deadline}s exceeded')
+        self._worker.restart()
+
+        _, x0, _ = self._pending
+        self._pending = None
+
+        return self._deadline_exceeded(par_vals, x0)
+
+    def _deadline_exceeded(self, par_vals: list[float], x0: np.ndarray) -> NLPSolution:
+        """ returns the initial guess as failed solution, self.solution is kept for the next warm start """
+
+        return NLPSolution(
+            layout=self._layout,
+            par_vals=par_vals,
+            opt_vals=np.array(x0, dtype=float),
+            runtime=self.deadline,
+            success=False,
+            status='Deadline_Exceeded',
+        )
+
+    def _solve_multi_start(self, par_vals: list[float]) -> NLPSolution:
+        """ solves the nlp from multiple initial guesses in parallel and keeps the best solution """
+
+        nlp_instance = self._instance(par_vals)
+        starts = self._starts(par_vals, nlp_instance['x0'])
+
+        # the subprocesses hold a copy of the solver, so they are restarted after the nlp was rebuilt
+        if any(worker.solver is not self.solver for worker in self._pool):
+            self._close_pool()
+        while len(self._pool) < len(starts):
+            self._pool.append(SolverProcess(solver=self.solver))
+
+        print(f'start solving from {len(starts)} initial guesses')
+        start_time = time.perf_counter()
+
+        for worker, x0 in zip(self._pool, starts.values()):
+            worker.submit({**nlp_instance, 'x0': x0})
+
+        results: dict[str, dict] = dict()
+        for name, worker in zip(starts, self._pool):
+
+            timeout = None if self.deadline is None else max(0.0, start_time + self.deadline - time.perf_counter())
+
+            try:
+                result = worker.result(timeout=timeout)
+            except RuntimeError as e:
+                print(f'start {name} failed: {e}')
+                continue
+
+            if result is None:
+                # the solver can not be interrupted, so the process is killed and started again
+                worker.restart()
+                continue
+
+            results[name] = result
+
+        runtime = time.perf_counter() - start_time
+
+        if not results:
+            print(f'deadline of {self.deadline}s exceeded')
+            return self._deadline_exceeded(par_vals, nlp_instance['x0'])
+
+        # the successful solution with the lowest cost, if no solve succeeded the one with the lowest cost
+        succeeded = [name for name, result in results.items() if result['stats']['success']]
+        best = min(succeeded or results, key=lambda name: results[name]['f'])
+
+        print(f'{len(succeeded)}/{len(starts)} starts succeeded, best start: {best}')
+
+        stats = {**results[best]['stats'], 'start': best, 'starts_succeeded': len(succeeded)}
+
+        return self._solution(par_vals, results[best], stats, runtime)
+
+    def _starts(self, par_vals: list[float], x0: np.ndarray) -> dict[str, np.ndarray]:
+        """ returns the initial guesses of the multi start, beginning with the warm start """
+
+        x0 = np.array(x0, dtype=float).flatten()
+
+        starts = {
+            'warm': x0,
+            'cold': self._get_coldstart().astype(float),
+            'hold': self._hold_start(par_vals, x0),
+        }
+
+        # random perturbations of the warm start, scaled with the width of the bounds where they are finite
+        width = np.where(np.isfinite(self._ubx - self._lbx), self._ubx - self._lbx, np.maximum(np.abs(x0), 1))
+        for i in range(self.multi_start - len(starts)):
+            noise = self._rng.normal(0, self.start_perturbation, size=len(x0)) * width
+            starts[f'random_{i}'] = np.clip(x0 + noise, self._lbx, self._ubx)
+
+        return dict(list(starts.items())[:self.multi_start])
+
+    def _hold_start(self, par_vals: list[float], x0: np.ndarray) -> np.ndarray:
+        """ returns x0 with every control held at its last value (k=-1) or its default over the horizon """
+
+        x0 = x0.copy()
+
+        for i, opt_var in enumerate(self._opt_vars):
+
+            if not isinstance(opt_var.feature, Control):
+                continue
+
+            position = self._layout.positions.get((opt_var.col_name, -1))
+
+            if position is not None and position < len(par_vals):
+                x0[i] = par_vals[position]
+            else:
+                x0[i] = opt_var.feature.default
+
+        return np.clip(x0, self._lbx, self._ubx)
+
+    def _close_pool(self):
+        """ stops the subprocesses of the multi start """
+
+        for worker in self._pool:
+            worker.close()
+
+        self._pool = list()
+
+    def close(self):
+        """ stops all subprocesses of the nlp """
+
+        if self._worker is not None:
+            self._worker.close()
+            self._worker = None
+            self._pending = None
+
+        self._close_pool()
+
+    @property
+    def pending(self) -> bool:
+        """ True if a solve was submitted to the SolverProcess and its solution was not collected yet """
+
+        return self._pending is not None
+
+    def submit(self, par_vals: list[float]):
+        """ starts solving the nlp in a SolverProcess and returns immediately, see NLP.collect() """
+
+        assert self.solver is not None, 'Please make sure to call NLP.build() first.'
+        assert self._pending is None, 'Please collect the pending solution first.'
+
+        # the subprocess holds a copy of the solver, so it is restarted after the nlp was rebuilt
+        if self._worker is None or self._worker.solver is not self.solver:
+            if self._worker is not None:
+                self._worker.close()
+            self._worker = SolverProcess(solver=self.solver)
+
+        nlp_instance = self._instance(par_vals)
+
+        print('start solving')
+        self._worker.submit(nlp_instance)
+        self._pending = (par_vals, nlp_instance['x0'], time.perf_counter())
+
+    def collect(self, timeout: Optional[float] = None) -> Optional[NLPSolution]:
+        """ waits up to timeout seconds for the submitted solve, returns None if it did not finish yet """
+
+        assert self._pending is not None, 'Please make sure to call NLP.submit() first.'
+
+        try:
+            result = self._worker.result(timeout=timeout)
+        except (RuntimeError, EOFError):
+            # the SolverProcess was restarted, so the submitted solve is lost
+            self._pending = None
+            raise
+
+        if result is None:
+            return None
+
+        par_vals, _, start_time = self._pending
+        self._pending = None
+
+        return self._solution(par_vals, result, result['stats'], time.perf_counter() - start_time)
@@ -0,0 +1,156 @@
+""" rti.py: Real-time iteration scheme for the nlp of the Model Predictive Controller """
+import time
+from typing import Optional
+
+import numpy as np
+from casadi import DM, Function, conic, hessian, jacobian, mtimes
+
+from ddmpc.controller.model_predictive.nlp import NLP, NLPSolution
+
+
+class RealTimeIteration:
+    """
+    Performs a single SQP iteration per control step instead of solving the nlp to convergence.
+    The preparation phase linearizes the nlp at the shifted last solution before the new measurements are known,
+    the feedback phase only corrects the linearization with the new parameters and solves one QP.
+    """
+
+    def __init__(
+            self,
+            nlp: NLP,
+            qp_solver: str = 'qrqp',
+            qp_options: Optional[dict] = None,
+            regularization: float = 1e-4,
+    ):
+        """
+        :param nlp: built nlp to perform the iterations on
+        :param qp_solver: casadi conic plugin used to solve the QP
+        :param qp_options: options for the QP solver
+        :param regularization: added to the diagonal of the objective hessian, so the QP is strictly convex
+        """
+
+        if qp_options is None:
+            qp_options = {'print_iter': False, 'print_header': False, 'print_info': False, 'error_on_fail': False}
+
+        self.nlp: NLP = nlp
+        self.qp_solver: str = qp_solver
+        self.qp_options: dict = qp_options
+        self.regularization: float = regularization
+
+        # solver of the nlp the linearization was created for, a rebuilt nlp requires a new linearization
+        self._solver: Optional[Function] = None
+        self._linearization: Optional[Function] = None
+        self._qp: Optional[Function] = None
+        self._shift_p: Optional[np.ndarray] = None
+
+        # last parameters and the prepared QP
+        self._p: Optional[np.ndarray] = None
+        self._prepared: Optional[dict] = None
+
+    def __str__(self):
+        return f'RealTimeIteration(qp_solver={self.qp_solver})'
+
+    def __repr__(self):
+        return f'RealTimeIteration(qp_solver={self.qp_solver})'
+
+    def _setup(self):
+        """ creates the linearization of the nlp and the QP solver """
+
+        assert self.nlp.solver is not None, 'Please make sure to call NLP.build() first.'
+        assert self.nlp._problem is not None, \
+            'The real-time iteration requires the symbolic problem, please build the NLP instead of loading it.'
+
+        x, p, f, g = (self.nlp._problem[key] for key in ('x', 'p', 'f', 'g'))
+
+        # the hessian of the objective neglects the curvature of the predictions, like a Gauss-Newton hessian
+        h, grad_f = hessian(f, x)
+        h = h + self.regularization * DM.eye(x.numel())
+
+        self._linearization = Function(
+            'linearization',
+            [x, p],
+            [h, grad_f, jacobian(grad_f, p), g, jacobian(g, x), jacobian(g, p)],
+        )
+        self._qp = conic('qp', self.qp_solver, {'h': h.sparsity(), 'a': jacobian(g, x).sparsity()}, self.qp_options)
+
+        # the par vars are shifted like the opt vars, the parameters of the predictors are kept
+        n_pars = len(self.nlp._par_vars)
+        shift_p = self.nlp._shift_indices(
+            [((par_var.__class__.__name__, par_var.feature.source.name), par_var.k) for par_var in self.nlp._par_vars])
+        self._shift_p = np.concatenate([shift_p, np.arange(n_pars, p.numel())]).astype(int)
+
+        self._solver = self.nlp.solver
+        self._prepared = None
+
+    def prepare(self):
+        """ linearizes the nlp at the shifted last solution, so the feedback only has to solve one QP """
+
+        self._prepared = None
+
+        if self._solver is not self.nlp.solver:
+            self._setup()
+
+        # after a failed step the next feedback solves the nlp to convergence
+        if self.nlp.solution is None or self.nlp.lastSolutionFailed or self._p is None:
+            return
+
+        x = self.nlp.solution.opt_vals[self.nlp._shift_x]
+        p = self._p[self._shift_p]
+
+        h, grad_f, grad_f_p, g, jac_g, jac_g_p = self._linearization(x, p)
+
+        self._prepared = {
+            'x': x, 'p': p, 'h': h, 'grad_f': grad_f, 'grad_f_p': grad_f_p, 'g': g, 'jac_g': jac_g, 'jac_g_p': jac_g_p,
+        }
+
+    def feedback(self, par_vals: list[float]) -> NLPSolution:
+        """ solves the prepared QP for the given par vals or the full nlp if nothing is prepared """
+
+        p = self.nlp._parameter_vector(par_vals)
+
+        if self._prepared is None or self._solver is not self.nlp.solver:
+            solution = self.nlp.solve(par_vals)
+            self._p = p
+            return solution
+
+        start_time = time.perf_counter()
+
+        prepared = self._prepared
+        dp = DM(p - prepared['p'])
+
+        # first order correction of the linearization with the new parameters
+        grad_f = prepared['grad_f'] + mtimes(prepared['grad_f_p'], dp)
+        g = np.array(prepared['g'] + mtimes(prepared['jac_g_p'], dp)).flatten()
+
+        result = self._qp(
+            h=prepared['h'],
+            g=grad_f,
+            a=prepared['jac_g'],
+            lba=self.nlp._lbg - g,
+            uba=self.nlp._ubg - g,
+            lbx=self.nlp._lbx - prepared['x'],
+            ubx=self.nlp._ubx - prepared['x'],
+        )
+
+        stop_time = time.perf_counter()
+
+        stats = self._qp.stats()
+
+        self.nlp.lastSolutionFailed = not stats['success']
+        self.nlp._lam_x = result['lam_x'].toarray().flatten()
+        self.nlp._lam_g = result['lam_a'].toarray().flatten()
+
+        self.nlp.solution = NLPSolution(
+            layout=self.nlp._layout,
+            par_vals=par_vals,
+            opt_vals=prepared['x'] + result['x'].toarray().flatten(),
+            runtime=stop_time - start_time,
+            success=stats['success'],
+            status=stats['return_status'],
+            stats=stats,
+        )
+
+        self._p = p
+        self._prepared = None
+
+        return self.nlp.solution
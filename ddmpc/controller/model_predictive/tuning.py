@@ -0,0 +1,225 @@
+""" tuning.py: Benchmarks solver options of the nlp on recorded parameter vectors """
+import itertools
+import time
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from casadi import MX, SX, Function, nlpsol
+
+from ddmpc.controller.model_predictive.nlp import NLP
+
+
+def _benchmark(serialized_problem: str, backend: str, alg: str, options: dict, instances: list[dict],
+               warm_start: bool) -> dict:
+    """ builds the solver with the options and solves all instances, runs in a subprocess """
+
+    problem = Function.deserialize(serialized_problem)
+    symbolic = SX if backend == 'SX' else MX
+
+    x = symbolic.sym('x', problem.size_in(0))
+    p = symbolic.sym('p', problem.size_in(1))
+    f, g = problem(x, p)
+
+    start_time = time.perf_counter()
+    solver = nlpsol('solver', alg, {'x': x, 'p': p, 'f': f, 'g': g}, options)
+    build_time = time.perf_counter() - start_time
+
+    runtimes, iterations, successes = list(), list(), list()
+    x0 = None
+
+    for instance in instances:
+
+        # the instances are solved in their recorded order, each from the last successful solution
+        if warm_start and x0 is not None:
+            instance = {**instance, 'x0': x0}
+
+        start_time = time.perf_counter()
+        result = solver(**instance)
+        runtimes.append(time.perf_counter() - start_time)
+
+        stats = solver.stats()
+        iterations.append(stats.get('iter_count', np.nan))
+        successes.append(bool(stats['success']))
+
+        x0 = np.array(result['x']).flatten() if stats['success'] else None
+
+    return {'build_time': build_time, 'runtimes': runtimes, 'iterations': iterations, 'successes': successes}
+
+
+class SolverTuner:
+    """
+    Solves recorded nlp instances with every option set of a grid and recommends the fastest option set
+    that reaches the required success rate. The option sets are benchmarked in parallel subprocesses,
+    which rebuild the solver from the serialized problem of a built NLP.
+    """
+
+    # options that are added to every option set to keep the solvers quiet
+    quiet_options: dict = {'ipopt.print_level': 0, 'print_time': False}
+
+    def __init__(
+            self,
+            nlp:            NLP,
+            options:        Optional[list[dict]] = None,
+            alg:            str = 'ipopt',
+            workers:        int = 1,
+            success_rate:   float = 0.95,
+            warm_start:     bool = True,
+    ):
+        """
+        :param nlp: built NLP whose problem is benchmarked
+        :param options: option sets that are compared, by default the grid of SolverTuner.default_options()
+        :param alg: nlp solver plugin
+        :param workers: number of subprocesses, the solve times of parallel workers may influence each other
+        :param success_rate: minimum share of successful solves of the recommended option set
+        :param warm_start: if True, each instance starts from the solution of the previous one as in a real run,
+                           otherwise every instance starts from the cold start
+        """
+
+        assert nlp._problem is not None, 'Please make sure to call NLP.build() first.'
+
+        self.nlp:           NLP = nlp
+        self.options:       list[dict] = options if options is not None else self.default_options()
+        self.alg:           str = alg
+        self.workers:       int = workers
+        self.success_rate:  float = success_rate
+        self.warm_start:    bool = warm_start
+
+        self.results: Optional[pd.DataFrame] = None
+
+        # error of every option set whose benchmark failed, by its position in SolverTuner.options
+        self.errors: dict[int, str] = dict()
+
+    def __str__(self):
+        return f'SolverTuner({len(self.options)} option sets)'
+
+    def __repr__(self):
+        return f'SolverTuner({len(self.options)} option sets)'
+
+    @staticmethod
+    def grid(**choices: list) -> list[dict]:
+        """ returns every combination of the choices, e.g. grid(**{'ipopt.tol': [1e-8, 1e-6], 'expand': [True]}) """
+
+        return [dict(zip(choices, values)) for values in itertools.product(*choices.values())]
+
+    @staticmethod
+    def default_options() -> list[dict]:
+        """ grid of the ipopt options that usually have the largest impact, extend the linear solvers if available """
+
+        return SolverTuner.grid(**{
+            'ipopt.linear_solver':          ['mumps'],
+            'ipopt.hessian_approximation':  ['exact', 'limited-memory'],
+            'ipopt.mu_strategy':            ['monotone', 'adaptive'],
+            'ipopt.tol':                    [1e-8, 1e-6],
+            'expand':                       [False, True],
+        })
+
+    @staticmethod
+    def par_vals_from(nlp: NLP, solutions: Mapping[float, pd.DataFrame]) -> list[list[float]]:
+        """
+        reads the parameter vectors from recorded solutions, e.g. the first return value of load_solutions().
+        Solutions that do not contain every par var of the nlp are skipped
+        """
+
+        positions = [(par_var.col_name, par_var.k) for par_var in nlp._par_vars]
+
+        par_vals = list()
+        for period in sorted(solutions):
+
+            df = solutions[period]
+
+            try:
+                values = [float(df.at[k, col_name]) for col_name, k in positions]
+            except KeyError:
+                continue
+
+            if not np.isnan(values).any():
+                par_vals.append(values)
+
+        return par_vals
+
+    def _instances(self, par_vals: list[list[float]]) -> list[dict]:
+        """ returns the numerical values of the nlp for every parameter vector, starting from the cold start """
+
+        x0 = self.nlp._get_coldstart()
+
+        return [{
+            'x0':   x0,
+            'p':    self.nlp._parameter_vector(values),
+            'lbx':  self.nlp._lbx,
+            'ubx':  self.nlp._ubx,
+            'lbg':  self.nlp._lbg,
+            'ubg':  self.nlp._ubg,
+        } for values in par_vals]
+
+    def run(self, par_vals: list[list[float]]) -> pd.DataFrame:
+        """
+        benchmarks every option set on the parameter vectors
+        :param par_vals: recorded parameter vectors of the nlp, e.g. NLPSolution.par_vals or SolverTuner.par_vals_from()
+        :return: DataFrame with the options, success rate, iterations, build time and solve times of every option set.
+                 Option sets whose benchmark failed are missing, their errors are stored in SolverTuner.errors
+        """
+
+        assert len(par_vals) > 0, 'Please pass at least one parameter vector.'
+
+        problem = self.nlp._problem
+        serialized = Function('nlp', [problem['x'], problem['p']], [problem['f'], problem['g']]).serialize()
+        instances = self._instances(par_vals)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(_benchmark, serialized, self.nlp.backend, self.alg,
+                                {**self.quiet_options, **options}, instances, self.warm_start)
+                for options in self.options
+            ]
+
+            rows = dict()
+            self.errors = dict()
+            for i, (options, future) in enumerate(zip(self.options, futures)):
+
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # printed on its own line, so it is not overwritten by the progress
+                    self.errors[i] = repr(e)
+                    print(f'\noption set {i} failed: {e}')
+                    continue
+
+                runtimes = np.array(result['runtimes'])
+
+                rows[i] = {
+                    **{option: str(value) for option, value in options.items()},
+                    'success_rate': float(np.mean(result['successes'])),
+                    'mean_iter':    float(np.nanmean(result['iterations'])),
+                    'build_time':   result['build_time'],
+                    'mean_time':    runtimes.mean(),
+                    'p90_time':     np.percentile(runtimes, 90),
+                    'max_time':     runtimes.max(),
+                }
+
+                print(f'\rbenchmarked option set {i + 1}/{len(self.options)}', end='')
+
+        print()
+
+        # the index is the position of the option set in SolverTuner.options
+        self.results = pd.DataFrame.from_dict(rows, orient='index')
+
+        return self.results
+
+    def recommend(self) -> dict:
+        """ returns the option set with the lowest mean solve time that reaches the success rate """
+
+        assert self.results is not None, 'Please make sure to call SolverTuner.run() first.'
+
+        if self.results.empty:
+            raise ValueError(f'The benchmark of every option set failed: {self.errors}')
+
+        valid = self.results[self.results['success_rate'] >= self.success_rate]
+
+        if valid.empty:
+            raise ValueError(f'No option set reached a success rate of {self.success_rate}, '
+                             f'the best one reached {self.results["success_rate"].max()}.')
+
+        return dict(self.options[int(valid['mean_time'].idxmin())])
@@ -0,0 +1,143 @@
+""" workers.py: Persistent subprocesses that solve the nlp outside the main interpreter """
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import Optional
+
+import numpy as np
+from casadi import Function
+
+
+def _solve_loop(serialized_solver: str, connection: Connection):
+    """ deserializes the solver once and solves every nlp instance that is received until None is received """
+
+    solver = Function.deserialize(serialized_solver)
+
+    while True:
+
+        nlp_instance = connection.recv()
+
+        if nlp_instance is None:
+            break
+
+        result = solver(**nlp_instance)
+
+        connection.send({
+            'x':        np.array(result['x']).flatten(),
+            'f':        float(result['f']),
+            'lam_x':    np.array(result['lam_x']).flatten(),
+            'lam_g':    np.array(result['lam_g']).flatten(),
+            'stats':    solver.stats(),
+        })
+
+
+class SolverProcess:
+    """ subprocess that holds a built solver and only receives the numerical values of the nlp """
+
+    def __init__(self, solver: Function):
+        """
+        :param solver: built casadi solver, it is serialized and passed to the subprocess once
+        """
+
+        self.solver: Function = solver
+        self._serialized_solver: str = solver.serialize()
+
+        self._process: Optional[multiprocessing.Process] = None
+        self._connection: Optional[Connection] = None
+
+        # True while an nlp instance is being solved
+        self.busy: bool = False
+
+        self.start()
+
+    def __str__(self):
+        return f'SolverProcess(pid={self._process.pid if self._process else None})'
+
+    def __repr__(self):
+        return f'SolverProcess(pid={self._process.pid if self._process else None})'
+
+    def start(self):
+        """ starts the subprocess """
+
+        self._connection, child_connection = multiprocessing.Pipe()
+
+        self._process = multiprocessing.Process(
+            target=_solve_loop,
+            args=(self._serialized_solver, child_connection),
+            daemon=True,
+        )
+        self._process.start()
+        self.busy = False
+
+    def submit(self, nlp_instance: dict):
+        """ passes the nlp instance (x0, p, lbx, ...) to the subprocess without waiting for the result """
+
+        assert not self.busy, 'The SolverProcess is still solving. Please wait for the result first.'
+
+        # the subprocess may have died after the last result, e.g. it was killed
+        if not self._process.is_alive():
+            self.restart()
+
+        try:
+            self._connection.send(nlp_instance)
+        except (BrokenPipeError, ConnectionError, EOFError):
+            self.restart()
+            try:
+                self._connection.send(nlp_instance)
+            except (BrokenPipeError, ConnectionError, EOFError) as e:
+                raise RuntimeError(f'The SolverProcess could not be restarted: {e!r}')
+
+        self.busy = True
+
+    def result(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """ waits up to timeout seconds (forever if None) for the result and returns None if it is not ready """
+
+        assert self.busy, 'Nothing was submitted to the SolverProcess.'
+
+        if not self._connection.poll(timeout):
+
+            if not self._process.is_alive():
+                self._terminated()
+
+            return None
+
+        try:
+            result = self._connection.recv()
+        except (EOFError, ConnectionError):
+            # poll() also returns True if the subprocess died and closed its end of the pipe
+            self._terminated()
+
+        self.busy = False
+
+        return result
+
+    def _terminated(self):
+        """ restarts the subprocess after it terminated unexpectedly, e.g. after a crash of the solver """
+
+        self.restart()
+        raise RuntimeError('The SolverProcess terminated unexpectedly and was restarted.')
+
+    def restart(self):
+        """ kills the subprocess, e.g. if a solve does not return in time, and starts a new one """
+
+        self._process.kill()
+        self._process.join()
+        self._connection.close()
+
+        self.start()
+
+    def close(self):
+        """ stops the subprocess """
+
+        if self._process is None:
+            return
+
+        if self._process.is_alive() and not self.busy:
+            self._connection.send(None)
+            self._process.join(timeout=1)
+
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+
+        self._connection.close()
+        self._process = None
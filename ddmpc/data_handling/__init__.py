@@ -1,4 +1,5 @@
 from .linearity_detection import *
 from .processing_data import *
 from .reduction import *
+from .solution_store import *
 from .storing_data import *
@@ -3,6 +3,7 @@ import matplotlib.pyplot as plt
 from matplotlib.colors import LinearSegmentedColormap
 from sklearn import linear_model
 
+from ddmpc.data_handling.solution_store import StoredSolutions
 from ddmpc.data_handling.storing_data import *
 
 
@@ -86,6 +87,18 @@ def compare(
 
 
 def load_solutions(file: str) -> tuple[dict[float, pd.DataFrame], float, float]:
+    """
+    loads the solutions of the Model Predictive Controller.
+    hdf5 files of the SolutionStore are read lazily, the solutions are only loaded when they are accessed
+    """
+
+    if Path(file).suffix == '.h5':
+        solutions = StoredSolutions(file)
+
+        if len(solutions) == 0:
+            raise ValueError(f'{file} does not contain any solutions.')
+
+        return solutions, list(solutions.keys())[0], list(solutions.keys())[-1]
 
     solutions = read_pkl(file)
 
@@ -0,0 +1,156 @@
+""" solution_store.py: Buffered binary storage for the solutions of the Model Predictive Controller """
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import h5py
+import numpy as np
+import pandas as pd
+
+
+class SolutionStore:
+    """
+    Buffers the solutions of the nlp in memory as array (period x k x column) and appends them to a compressed
+    hdf5 file every buffer_size solutions. The layout (k and columns) is fixed by the first solution.
+    """
+
+    def __init__(
+            self,
+            filepath:       Union[str, Path],
+            step_size:      float,
+            buffer_size:    int = 96,
+            compression:    str = 'gzip',
+    ):
+        """
+        :param filepath: path of the hdf5 file, an existing file is replaced
+        :param step_size: step size of the nlp in seconds, used to calculate the time column when reading
+        :param buffer_size: number of solutions that are kept in memory before they are written to the disc
+        :param compression: compression filter of h5py, e.g. 'gzip' or 'lzf'
+        """
+
+        self.filepath:      Path = Path(filepath)
+        self.step_size:     float = step_size
+        self.buffer_size:   int = buffer_size
+        self.compression:   str = compression
+
+        # layout of a single solution
+        self.k:         Optional[np.ndarray] = None
+        self.columns:   Optional[list[str]] = None
+
+        self._periods:  list[float] = list()
+        self._buffer:   Optional[np.ndarray] = None
+
+        if self.filepath.exists():
+            self.filepath.unlink()
+
+    def __str__(self):
+        return f'SolutionStore({self.filepath})'
+
+    def __repr__(self):
+        return f'SolutionStore({self.filepath})'
+
+    def __len__(self):
+        return len(self._periods)
+
+    def append(self, period: float, df: pd.DataFrame):
+        """
+        adds a solution to the buffer
+        :param period: time the solution was calculated for
+        :param df: solution with the time steps k as index, see NLPSolution.df
+        """
+
+        if self.columns is None:
+            self.k = np.array(df.index, dtype=int)
+            self.columns = [str(col) for col in df.columns]
+            self._buffer = np.empty(shape=(self.buffer_size, len(self.k), len(self.columns)), dtype=float)
+
+        if not set(df.columns).issubset(self.columns):
+            raise ValueError(f'The columns {set(df.columns) - set(self.columns)} are not part of the layout of '
+                             f'{self}. Please use a new SolutionStore after changing the nlp.')
+
+        self._buffer[len(self._periods)] = df.reindex(index=self.k, columns=self.columns).values
+        self._periods.append(float(period))
+
+        if len(self._periods) == self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """ appends the buffered solutions to the hdf5 file and clears the buffer """
+
+        n = len(self._periods)
+
+        if n == 0:
+            return
+
+        with h5py.File(self.filepath, 'a') as file:
+
+            if 'values' not in file:
+                file.create_dataset(
+                    'values',
+                    shape=(0, len(self.k), len(self.columns)),
+                    maxshape=(None, len(self.k), len(self.columns)),
+                    chunks=(self.buffer_size, len(self.k), len(self.columns)),
+                    dtype=float,
+                    compression=self.compression,
+                )
+                file.create_dataset('period', shape=(0,), maxshape=(None,), chunks=(self.buffer_size,), dtype=float)
+                file.create_dataset('k', data=self.k)
+                file.attrs['columns'] = self.columns
+                file.attrs['step_size'] = self.step_size
+
+            values = file['values']
+            periods = file['period']
+
+            values.resize(values.shape[0] + n, axis=0)
+            values[-n:] = self._buffer[:n]
+
+            periods.resize(periods.shape[0] + n, axis=0)
+            periods[-n:] = self._periods
+
+        self._periods = list()
+
+
+class StoredSolutions(Mapping):
+    """
+    Read only view onto the hdf5 file of a SolutionStore, that maps the period to the solution DataFrame.
+    Only the periods are read initially, the solutions are read from the file when they are accessed.
+    """
+
+    def __init__(self, filepath: Union[str, Path]):
+
+        self.filepath: Path = Path(filepath)
+
+        if not self.filepath.exists():
+            raise FileNotFoundError(f'The path {self.filepath} does not exist.')
+
+        with h5py.File(self.filepath, 'r') as file:
+            periods = file['period'][:]
+            self.k:         np.ndarray = file['k'][:]
+            self.columns:   list[str] = [str(col) for col in file.attrs['columns']]
+            self.step_size: float = float(file.attrs['step_size'])
+
+        self._index: dict[float, int] = {float(period): i for i, period in enumerate(periods)}
+
+    def __str__(self):
+        return f'StoredSolutions({self.filepath})'
+
+    def __repr__(self):
+        return f'StoredSolutions({self.filepath})'
+
+    def __getitem__(self, period: float) -> pd.DataFrame:
+
+        i = self._index[float(period)]
+
+        with h5py.File(self.filepath, 'r') as file:
+            values = file['values'][i]
+
+        df = pd.DataFrame(values, index=self.k, columns=self.columns)
+        df['time'] = period + df.index * self.step_size
+
+        return df
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
@@ -1,7 +1,12 @@
+import threading
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Iterator, Optional, Union
 
+import numpy as np
 import pandas as pd
-from casadi import MX, fabs
+from casadi import MX, SX, fabs
 
 import ddmpc.utils.formatting as fmt
 
@@ -42,7 +47,172 @@ dotted_grey_line = PlotOptions(color=fmt.grey, line=fmt.line_dotted)
 dark_grey_line = PlotOptions(color=fmt.dark_grey, line=fmt.line_solid)
 
 
+class SymbolRegistry:
+    """
+    Holds the symbols and expressions of the Sources at the time steps k for one nlp. The entries are indexed by
+    (source id, k) in an integer array, so the symbols of one build are released together by clear().
+    Source[k] and Source.mx use the registry that is active in the current thread, see SymbolRegistry.activate()
+    """
+
+    def __init__(self, symbolic: type = MX):
+        """
+        :param symbolic: symbolic type (MX or SX) of the created symbols
+        """
+
+        self.symbolic: type = symbolic
+
+        self._ids:      dict[Source, int] = dict()
+        self._index:    dict[tuple[int, int], int] = dict()
+        self._keys:     np.ndarray = np.empty(shape=(64, 2), dtype=int)
+        self._symbols:  list[Union[MX, SX]] = list()
+
+    def __str__(self):
+        return f'SymbolRegistry({self.symbolic.__name__}, {len(self)} symbols)'
+
+    def __repr__(self):
+        return f'SymbolRegistry({self.symbolic.__name__}, {len(self)} symbols)'
+
+    def __len__(self):
+        return len(self._symbols)
+
+    @property
+    def keys(self) -> np.ndarray:
+        """ (source id, k) of every entry """
+
+        return self._keys[:len(self)]
+
+    def clear(self, symbolic: Optional[type] = None):
+        """ removes all entries, e.g. before the nlp is built again, and optionally changes the symbolic type """
+
+        if symbolic is not None:
+            self.symbolic = symbolic
+
+        self._ids = dict()
+        self._index = dict()
+        self._keys = np.empty(shape=(64, 2), dtype=int)
+        self._symbols = list()
+
+    def _id(self, source: 'Source') -> int:
+
+        if source not in self._ids:
+            self._ids[source] = len(self._ids)
+
+        return self._ids[source]
+
+    def contains(self, source: 'Source', k: int) -> bool:
+
+        return source in self._ids and (self._ids[source], k) in self._index
+
+    def get(self, source: 'Source', k: int) -> Union[MX, SX]:
+        """ returns the entry of the source at k and creates the symbol if there is none """
+
+        if not self.contains(source, k):
+            self.set(source, k, self.symbolic.sym(f'{source.name}[{"%+d" % k}]'))
+
+        return self._symbols[self._index[self._id(source), k]]
+
+    def set(self, source: 'Source', k: int, mx: Union[MX, SX]):
+        """ sets the entry of the source at k, e.g. to an expression or to the symbol of another k """
+
+        key = (self._id(source), k)
+
+        if key in self._index:
+            self._symbols[self._index[key]] = mx
+            return
+
+        # grow the index array by doubling its size
+        if len(self) == len(self._keys):
+            self._keys = np.concatenate([self._keys, np.empty_like(self._keys)])
+
+        self._keys[len(self)] = key
+        self._index[key] = len(self)
+        self._symbols.append(mx)
+
+    def ks(self, source: 'Source') -> list[int]:
+        """ returns the time steps of all entries of the source """
+
+        if source not in self._ids:
+            return list()
+
+        keys = self.keys
+        return keys[keys[:, 0] == self._ids[source], 1].tolist()
+
+    @contextmanager
+    def activate(self):
+        """ makes this registry the active one of the current thread within the with statement """
+
+        previous = getattr(_active, 'registry', None)
+        _active.registry = self
+
+        try:
+            yield self
+        finally:
+            _active.registry = previous
+
+
+# registry of the symbols that are created while no registry is active, e.g. by WhiteBox models or by Source[k]
+# in user code. It is never cleared automatically, see clear_default_registry()
+_default_registry = SymbolRegistry()
+
+# the active registry of every thread
+_active = threading.local()
+
+
+def active_registry(required: bool = False) -> SymbolRegistry:
+    """
+    returns the SymbolRegistry that is active in the current thread, or the default registry if none is active
+    :param required: if True, a RuntimeError is raised if no registry is active instead of using the default one
+    """
+
+    registry = getattr(_active, 'registry', None)
+
+    if registry is None and required:
+        raise RuntimeError('No SymbolRegistry is active. The symbols of an NLP are only created within NLP.build() '
+                           'or NLP.load(), use NLP.registry.activate() to access them afterwards.')
+
+    return registry if registry is not None else _default_registry
+
+
+def clear_default_registry():
+    """
+    removes the symbols that were created outside of an active SymbolRegistry, e.g. in long running scripts that
+    create many models. Expressions that were created before, e.g. the output expression of a WhiteBox, keep their
+    symbols, but new calls to Source[k] return new symbols that are not related to them
+    """
+
+    _default_registry.clear()
+
+
+class SymbolView(Mapping):
+    """ dict like view onto the entries of one Source in the active SymbolRegistry, mapping k to the symbol """
+
+    def __init__(self, source: 'Source'):
+        self.source: Source = source
+
+    def __getitem__(self, k: int) -> Union[MX, SX]:
+
+        registry = active_registry()
+
+        if not registry.contains(self.source, k):
+            raise KeyError(k)
+
+        return registry.get(self.source, k)
+
+    def __setitem__(self, k: int, mx: Union[MX, SX]):
+        active_registry().set(self.source, k, mx)
+
+    def __contains__(self, k) -> bool:
+        return active_registry().contains(self.source, k)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(active_registry().ks(self.source))
+
+    def __len__(self) -> int:
+        return len(active_registry().ks(self.source))
+
+
 class Source(ABC):
+
     def __init__(
         self,
         name: str,
@@ -50,7 +220,15 @@ class Source(ABC):
     ):
         self.name: str = name
         self.plt_opts: PlotOptions = plt_opts
-        self.mx: dict[int, MX] = dict()
+
+    @property
+    def mx(self) -> SymbolView:
+        """
+        symbols and expressions of this Source in the active SymbolRegistry, indexed by k.
+        Outside of NLP.build() no registry is active and the default registry is read, not the one of an NLP
+        """
+
+        return SymbolView(self)
 
     def __str__(self):
         return self.name
@@ -75,15 +253,10 @@ class Source(ABC):
 
         return hash(self.name)
 
-    def __getitem__(self, k: int) -> MX:
-        """returns the MX variable for the given index"""
-
-        # if the index is not in the dictionary, create it
-        if k not in self.mx.keys():
-            self.mx[k] = MX.sym(f'{self.name}[{"%+d" % k}]')
+    def __getitem__(self, k: int) -> Union[MX, SX]:
+        """returns the MX variable for the given index, it is created in the active SymbolRegistry if necessary"""
 
-        # return the MX variable
-        return self.mx[k]
+        return active_registry().get(self, k)
 
     def __add__(self, other):
         if isinstance(other, Source):
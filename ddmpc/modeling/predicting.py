@@ -10,7 +10,7 @@ import numpy as np
 
 import ddmpc.utils.formatting as fmt
 from ddmpc.modeling.features.features import Feature
-from ddmpc.modeling.features.sources import Source
+from ddmpc.modeling.features.sources import Source, active_registry
 from ddmpc.utils.file_manager import FileManager as file_manager
 from ddmpc.utils.pickle_handler import write_pkl
 
@@ -193,6 +193,39 @@ class Predictor(ABC):
 
         pass
 
+    def parameters(self) -> Optional[np.ndarray]:
+        """
+        Returns the trained parameters of the predictor as flat vector.
+        Predictors without trainable parameters return None and are built into the NLP as they are.
+        """
+
+        return None
+
+    def parametric_predict(self, input_values: list, parameters: Union[ca.MX, ca.DM]) -> Union[ca.MX, ca.DM]:
+        """ Returns the prediction to a given Input using the passed parameters instead of the trained ones """
+
+        raise NotImplementedError(f'{self.__class__.__name__} does not support parametric predictions.')
+
+    def is_linear(self) -> bool:
+        """ True if the prediction is linear in the inputs, only then the NLP may be solved as quadratic program """
+
+        return False
+
+    def casadi_function(self, parametric: bool = False) -> ca.Function:
+        """
+        Returns a casadi Function for the prediction of one time step.
+        The inputs are passed as column vector in the order of the input list of the nlp,
+        parametric functions additionally take the parameters as second input.
+        """
+
+        x = active_registry().symbolic.sym('x', self.inputs.totalLag)
+
+        if parametric:
+            p = active_registry().symbolic.sym('p', self.parameters().size)
+            return ca.Function('predict', [x, p], [self.parametric_predict(ca.vertsplit(x), p)[0]])
+
+        return ca.Function('predict', [x], [self.predict(ca.vertsplit(x))[0]])
+
     def _test(
             self,
             train_set:      tuple[np.ndarray, np.ndarray],
@@ -46,10 +46,10 @@ class NeuralNetwork(Predictor):
         assert self.casadi_ann, 'Please fit the Sequential Keras model before trying to update the casadi ann.'
         self.casadi_ann = CasadiSequential(model=self.sequential)
 
-    def predict(self, input_values: Union[list, ca.MX, ca.DM, np.ndarray]) -> Union[list, ca.MX, ca.DM, np.ndarray]:
+    def predict(self, input_values: Union[list, ca.MX, ca.SX, ca.DM, np.ndarray]) -> Union[list, ca.MX, ca.SX, ca.DM, np.ndarray]:
         """ calculates the prediction to a given input """
 
-        if isinstance(input_values, ca.MX):
+        if isinstance(input_values, (ca.MX, ca.SX)):
             return self.casadi_ann.predict(ca.vertcat(input_values))
 
         elif isinstance(input_values, ca.DM):
@@ -75,7 +75,16 @@ class NeuralNetwork(Predictor):
                 return np.apply_along_axis(func1d=self.casadi_ann.predict, axis=1, arr=input_values).flatten()
 
         else:
-            raise NotImplementedError('Wrong Type passed. Allowed Types are: [list, ca.MX, ca.DM, np.ndarray]')
+            raise NotImplementedError('Wrong Type passed. Allowed Types are: [list, ca.MX, ca.SX, ca.DM, np.ndarray]')
+
+    def parameters(self) -> np.ndarray:
+        """ returns the weights of the casadi neural network as flat vector """
+
+        return self.casadi_ann.parameters
+
+    def parametric_predict(self, input_values: list, parameters: Union[ca.MX, ca.DM]) -> Union[ca.MX, ca.DM]:
+
+        return self.casadi_ann.parametric_forward(ca.horzcat(*input_values), parameters)
 
     def build_sequential(self, tuner_model: TunerModel):
         """ Builds a random sequential keras model by using the tuner model. """
@@ -115,7 +115,8 @@ class Layer(ABC):
 
     @staticmethod
     def get_activation(function: str) -> Function:
-        blank = MX.sym('blank')
+        # activations are scalar, SX functions can be inlined in both MX and SX graphs
+        blank = SX.sym('blank')
 
         if function == 'sigmoid':
             return Function(function, [blank], [1 / (1 + exp(-blank))])
@@ -141,6 +142,14 @@ class Layer(ABC):
         else:
             raise ValueError(f'Unknown activation function: "{function}"')
 
+    @property
+    def parameters(self) -> list[np.ndarray]:
+        """
+        Trained parameters of the layer in the order they are passed to forward().
+        Layers without trained parameters return an empty list.
+        """
+        return list()
+
     @abstractmethod
     def forward(self, input):
         ...
@@ -165,11 +174,19 @@ class Dense(Layer):
         # if self.input_shape[1] != self.weights.shape[0]:
         #     raise ValueError(f'Please check the input dimensions of this layer. Layer with error: {self.name}')
 
-    def forward(self, input):
-        # forward pass
-        length = input.shape[0]
-        f = self.activation(input @ self.weights + np.repeat(self.biases.reshape(1, self.biases.shape[0]),
-                                                             input.shape[0], axis=0))
+    @property
+    def parameters(self) -> list[np.ndarray]:
+        return [self.weights, self.biases]
+
+    def forward(self, input, weights=None, biases=None):
+        # forward pass with the trained weights
+        if weights is None:
+            f = self.activation(input @ self.weights + np.repeat(self.biases.reshape(1, self.biases.shape[0]),
+                                                                 input.shape[0], axis=0))
+            return f
+
+        # forward pass with the passed (symbolic) weights
+        f = self.activation(mtimes(input, weights) + repmat(biases, input.shape[0], 1))
 
         return f
 
@@ -222,7 +239,19 @@ class BatchNormalising(Layer):
             axis = self.config['axis'][0]
             raise ValueError(f'Dimension mismatch. Normalized axis: {axis}')
 
-    def forward(self, input):
+    @property
+    def parameters(self) -> list[np.ndarray]:
+        return self.weights[:4]
+
+    def forward(self, input, gamma=None, beta=None, mean=None, var=None):
+
+        # forward pass with the passed (symbolic) weights
+        if gamma is not None:
+            rows = self.input_shape[0]
+            gamma, beta, mean, var = (repmat(w, rows, 1) for w in (gamma, beta, mean, var))
+
+            return (input - mean) / (sqrt(var + self.epsilon)) * gamma + beta
+
         # forward pass
         f = (input - self.mean) / (sqrt(self.var + self.epsilon)) * self.gamma + self.beta
 
@@ -404,7 +433,7 @@ class CasadiSequential:
     def output_shape(self):
         return self.layers[-1].output_shape
 
-    def predict(self, input_values: Union[np.ndarray, list, MX, DM]):
+    def predict(self, input_values: Union[np.ndarray, list, MX, SX, DM]):
 
         if isinstance(input_values, np.ndarray):
 
@@ -457,9 +486,9 @@ class CasadiSequential:
 
     def update_forward(self):
 
-        # create symbolic input layer
+        # create symbolic input layer, the SX function is expanded when called with SX and embedded when called with MX
         layer = self.layers[0]
-        input_layer = MX.sym('input_layer', layer.input_shape[0], layer.input_shape[1])
+        input_layer = SX.sym('input_layer', layer.input_shape[0], layer.input_shape[1])
 
         # initialize
         f = input_layer
@@ -471,6 +500,37 @@ class CasadiSequential:
         # create the prediction function
         self._predict = Function('forward', [input_layer], [f])
 
+    @property
+    def parameters(self) -> np.ndarray:
+        """ returns the trained parameters of all layers as flat vector (column major) """
+
+        parameters = [np.ravel(p, order='F') for layer in self.layers for p in layer.parameters]
+
+        if not parameters:
+            return np.ndarray(shape=(0,))
+
+        return np.concatenate(parameters).astype(float)
+
+    def parametric_forward(self, input_values: Union[MX, DM], parameters: Union[MX, DM]) -> Union[MX, DM]:
+        """ passes the input forward through all layers using the passed parameters instead of the trained ones """
+
+        f = input_values
+        i = 0
+
+        for layer in self.layers:
+
+            layer_parameters = list()
+            for p in layer.parameters:
+
+                # vectors are passed as row vectors, matrices keep their shape
+                rows, cols = (1, p.shape[0]) if p.ndim == 1 else p.shape
+                layer_parameters.append(reshape(parameters[i:i + rows * cols], rows, cols))
+                i += rows * cols
+
+            f = layer.forward(f, *layer_parameters)
+
+        return f
+
     def add_layer(self, layer):
 
         # append layer
@@ -97,7 +97,7 @@ class GaussianProcess(Predictor):
             save_plot=save_plot,
         )
 
-    def predict(self, x: Union[list, ca.MX, ca.DM, np.ndarray]) -> ca.MX:
+    def predict(self, x: Union[list, ca.MX, ca.SX, ca.DM, np.ndarray]) -> Union[ca.MX, ca.SX]:
         """
         Return a prediction on the given input x using casadi.
 
@@ -110,7 +110,7 @@ class GaussianProcess(Predictor):
         x = self._normalize(x)
         k_star = self._kernel(x)
 
-        if isinstance(x, ca.MX):
+        if isinstance(x, (ca.MX, ca.SX)):
             f_mean = ca.mtimes(k_star.T, self.alpha) * self.scale
 
         else:
@@ -118,6 +118,51 @@ class GaussianProcess(Predictor):
 
         return f_mean
 
+    def parameters(self) -> np.ndarray:
+        """
+        Returns alpha, x_train (column major), constant_value and length_scale as flat vector.
+        If the GPR normalizes its inputs, mean and std are appended as they change with the training data, too.
+        """
+
+        parameters = [
+            np.ravel(self.alpha),
+            np.ravel(self.x_train, order='F'),
+            np.ravel(self.constant_value),
+            np.ravel(self.length_scale),
+        ]
+
+        if self.normalize:
+            parameters.extend([np.ravel(self.mean), np.ravel(self.std)])
+
+        return np.concatenate(parameters).astype(float)
+
+    def parametric_predict(self, input_values: list, parameters: Union[ca.MX, ca.DM]) -> Union[ca.MX, ca.DM]:
+        """ Return a prediction on the given input using the passed alpha and x_train instead of the fitted ones """
+
+        n_samples, n_features = self.x_train.shape
+
+        # unpack the parameters in the same order as they are returned by parameters()
+        i = 0
+        alpha = parameters[i:i + n_samples]
+        i += n_samples
+        x_train = ca.reshape(parameters[i:i + n_samples * n_features], n_samples, n_features)
+        i += n_samples * n_features
+        constant_value = parameters[i]
+        length_scale = parameters[i + 1]
+        i += 2
+
+        x = ca.vertcat(*input_values).T
+
+        if self.normalize:
+            mean = parameters[i:i + n_features].T
+            std = parameters[i + n_features:i + 2 * n_features].T
+            x = (x - mean) / std
+
+        square_distance = ca.sum2(x ** 2) + ca.sum2(x_train ** 2) - 2 * ca.mtimes(x_train, x.T)
+        k_star = ca.exp(-square_distance / (2 * length_scale ** 2)) * constant_value
+
+        return ca.mtimes(k_star.T, alpha) * self.scale
+
     def std(self, x: Union[ca.MX, np.ndarray]) -> ca.MX:
         assert x.shape[0] == 1
 
@@ -144,7 +189,7 @@ class GaussianProcess(Predictor):
         GaussianProcess.noise_level_bounds = (1e-5, 1e5)
 
     def _square_distance(
-        self, x_test: Union[ca.MX, np.ndarray], x_train: Union[ca.MX, np.ndarray] = None
+        self, x_test: Union[ca.MX, ca.SX, np.ndarray], x_train: Union[ca.MX, np.ndarray] = None
     ):
         """
         Calculates the square distance from x_train to x_test.
@@ -165,7 +210,7 @@ class GaussianProcess(Predictor):
 
         b = np.sum(x_train**2, axis=1, dtype=float).reshape(-1, 1)
 
-        if isinstance(x_test, ca.MX):
+        if isinstance(x_test, (ca.MX, ca.SX)):
             c = -2 * ca.mtimes(x_train, x_test.T)
 
         else:
@@ -174,8 +219,8 @@ class GaussianProcess(Predictor):
         return a + b + c
 
     def _kernel(
-        self, x_test: Union[ca.MX, np.ndarray], x_train: Union[ca.MX, np.ndarray] = None
-    ) -> ca.MX:
+        self, x_test: Union[ca.MX, ca.SX, np.ndarray], x_train: Union[ca.MX, np.ndarray] = None
+    ) -> Union[ca.MX, ca.SX]:
         """
         Calculates the kernel with regard to mpc and testing data.
         If x_train is None the internal mpc data is used.
@@ -220,7 +265,7 @@ class GaussianProcess(Predictor):
 
         assert self.mean is not None or self.std is None, "Please update std and mean."
 
-        if isinstance(x, ca.MX):
+        if isinstance(x, (ca.MX, ca.SX)):
             return (x - ca.DM(self.mean).T) / ca.DM(self.std).T
 
         # normalize x and return
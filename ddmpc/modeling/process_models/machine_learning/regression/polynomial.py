@@ -76,6 +76,21 @@ class LinearRegression(Predictor):
         else:
             raise ValueError("input_values has to be either a list, np.ndarray or ca.MX")
 
+    def is_linear(self) -> bool:
+
+        return True
+
+    def parameters(self) -> np.ndarray:
+        """ returns the coefficients followed by the intercept """
+
+        return np.concatenate([np.ravel(self.linear_model.coef_), np.ravel(self.linear_model.intercept_)])
+
+    def parametric_predict(self, input_values: list, parameters: Union[ca.MX, ca.DM]) -> Union[ca.MX, ca.DM]:
+
+        s = [v * parameters[i] for i, v in enumerate(input_values)]
+
+        return parameters[len(input_values)] + ca.sum1(ca.vertcat(*s))
+
     def print_coefficients(self, training_data: TrainingData):
 
         print('Coefficients for the Linear Regression:')
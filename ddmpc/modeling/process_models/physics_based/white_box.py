@@ -44,15 +44,44 @@ class WhiteBox(Predictor):
 
         self.predict_function = ca.Function('predict_function', self.sym_inputs, [output_expression])
 
-    def predict(self, input_values: Union[list, ca.MX, ca.DM, np.ndarray]) -> ca.MX:
+        # expanded version of the predict function, created on the first call with SX symbols
+        self._expanded_function: Optional[ca.Function] = None
+
+    def _function(self, input_values: Union[list, ca.MX, ca.SX, ca.DM, np.ndarray]) -> ca.Function:
+        """ returns the expanded predict function if the NLP is build with SX symbols """
+
+        values = input_values if isinstance(input_values, list) else [input_values]
+
+        if not any(isinstance(v, ca.SX) for v in values):
+            return self.predict_function
+
+        if getattr(self, '_expanded_function', None) is None:
+            self._expanded_function = self.predict_function.expand()
+
+        return self._expanded_function
+
+    def is_linear(self) -> bool:
+        """ True if the output expression is linear in the inputs """
+
+        try:
+            function = self.predict_function.expand()
+        except RuntimeError:
+            # e.g. external functions can not be expanded to scalar expressions
+            return False
+
+        x = ca.SX.sym('x', len(self.sym_inputs))
+
+        return bool(ca.is_linear(function(*ca.vertsplit(x)), x))
+
+    def predict(self, input_values: Union[list, ca.MX, ca.SX, ca.DM, np.ndarray]) -> Union[ca.MX, ca.SX]:
 
         if isinstance(input_values, list):
 
-            return self.predict_function(*input_values)
+            return self._function(input_values)(*input_values)
 
-        if isinstance(input_values, ca.MX):
+        if isinstance(input_values, (ca.MX, ca.SX)):
 
-            return self.predict_function(*ca.vertsplit(input_values))
+            return self._function(input_values)(*ca.vertsplit(input_values))
 
         elif isinstance(input_values, ca.DM):
 
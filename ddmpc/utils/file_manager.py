@@ -54,6 +54,11 @@ class FileManager(str):
 
         return str(FileManager._build_path(FileManager.base, 'predictors'))
 
+    @staticmethod
+    def solvers_dir() -> str:
+
+        return str(FileManager._build_path(FileManager.base, 'solvers'))
+
     @staticmethod
     def keras_model_filepath() -> str:
 
@@ -77,4 +82,5 @@ class FileManager(str):
         print(f'\t\tdata_dir:       {FileManager.data_dir()}')
         print(f'\t\tfmu_dir:       {FileManager.fmu_dir()}')
         print(f'\t\tpredictors_dir: {FileManager.predictors_dir()}')
+        print(f'\t\tsolvers_dir:    {FileManager.solvers_dir()}')
         print(f'\t\tkeras_models_dir: {FileManager.keras_model_filepath()}')
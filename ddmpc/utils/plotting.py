@@ -1,6 +1,7 @@
 import datetime
 import locale
 import math
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
 from typing import Optional, Iterator, Callable
 
@@ -395,13 +396,18 @@ class Plotter:
         else:
             axs = axs.tolist()
 
-        for i, (calculation_time, df) in enumerate(solutions.items()):
+        for i, calculation_time in enumerate(solutions.keys()):
 
             n = len(list(solutions.keys()))
             i = i / n
 
             grey = fmt.interpolate_colors(i, [fmt.red, fmt.dark_grey, fmt.light_grey])
 
+            # solutions after the end are skipped before they are accessed, as they may be loaded lazily
+            if end is not None and calculation_time > end.timestamp():
+                continue
+
+            df = solutions[calculation_time]
             df = df[df['time'] >= calculation_time]
 
             if end is not None:
@@ -656,4 +662,126 @@ class Plotter:
             axs[-1].xaxis.set_minor_formatter(minor_formatter)
         else:
             axs[-1].xaxis.set_minor_formatter(self.minor_formatter)
-            
\ No newline at end of file
+            
+
+# Plotter of the current plot process, set once by _init_plot_process
+_process_plotter: Optional[Plotter] = None
+
+
+def _init_plot_process(plotter: Plotter, base: str, experiment: str):
+    """ passes the Plotter and the FileManager settings to a new plot process """
+
+    global _process_plotter
+
+    matplotlib.use('Agg')
+
+    file_manager.base = base
+    file_manager.experiment = experiment
+
+    plotter.setup()
+    _process_plotter = plotter
+
+
+def _plot_in_process(df: pd.DataFrame, current_time: int, save_name: str):
+
+    _process_plotter.plot(df, show_plot=False, current_time=current_time, save_plot=True, save_name=save_name)
+
+
+class BackgroundPlotter:
+    """
+    Saves the plots of a Plotter in a pool of background processes, so the caller never waits on matplotlib.
+    If too many plots are pending, new ones are dropped.
+    """
+
+    def __init__(
+            self,
+            plotter:        Plotter,
+            workers:        int = 1,
+            every:          int = 1,
+            max_pending:    Optional[int] = 2,
+    ):
+        """
+        :param plotter: Plotter that is copied to every process
+        :param workers: number of plot processes
+        :param every: only every n-th submitted plot is rendered
+        :param max_pending: plots that are submitted while this many plots are pending are dropped,
+                            if None no plot is dropped
+        """
+
+        assert workers >= 1, 'BackgroundPlotter requires at least one worker.'
+        assert every >= 1, 'every must be a positive integer.'
+
+        self.plotter:       Plotter = plotter
+        self.workers:       int = workers
+        self.every:         int = every
+        self.max_pending:   Optional[int] = max_pending
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: list[Future] = list()
+
+        # number of submitted, rendered, dropped and failed plots
+        self.submitted: int = 0
+        self.rendered:  int = 0
+        self.dropped:   int = 0
+        self.failed:    int = 0
+
+    def __str__(self):
+        return f'BackgroundPlotter(workers={self.workers}, pending={len(self._pending)})'
+
+    def __repr__(self):
+        return f'BackgroundPlotter(workers={self.workers}, pending={len(self._pending)})'
+
+    def submit(self, df: pd.DataFrame, current_time: int, save_name: str) -> bool:
+        """ queues a plot and returns immediately, returns False if the plot was skipped or dropped """
+
+        self.submitted += 1
+
+        if (self.submitted - 1) % self.every != 0:
+            return False
+
+        # forget about finished plots
+        for future in [future for future in self._pending if future.done()]:
+            self._pending.remove(future)
+            self._finished(future)
+
+        if self.max_pending is not None and len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_plot_process,
+                initargs=(self.plotter, file_manager.base, file_manager.experiment),
+            )
+
+        self._pending.append(self._pool.submit(_plot_in_process, df, current_time, save_name))
+
+        return True
+
+    def close(self, wait: bool = True):
+        """ shuts the processes down, by default after the pending plots are saved """
+
+        if self._pool is None:
+            return
+
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+        for future in self._pending:
+            if future.done() and not future.cancelled():
+                self._finished(future)
+
+        self._pending = list()
+        self._pool = None
+
+    def _finished(self, future: Future):
+        """ counts a finished plot, errors of the plot process are printed instead of stopping the caller """
+
+        try:
+            future.result()
+        except Exception as e:
+            print(f'saving a plot failed in a background process: {e!r}')
+            self.failed += 1
+            return
+
+        self.rendered += 1